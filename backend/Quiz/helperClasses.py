@@ -1,13 +1,151 @@
+import abc
+import threading
+import time
+from collections import OrderedDict
+
+from django.db.models import Sum
+
+
 class statsByQuery():
 
     def __init__(self, query):
-        self.queryset = query.values()
+        self.queryset = query
 
     def getTotal(self):
-        total = 0
-        correct = 0
-        for item in self.queryset:
-            total += item['total']
-            correct += item['correct']
+        """
+        Sums total and correct in the database. Works on ReviewQuiz as well
+        as TopicStatistics querysets.
+        """
+        totals = self.queryset.aggregate(
+            total=Sum('total'), correct=Sum('correct'))
+
+        return {'total': totals['total'] or 0,
+                'correct': totals['correct'] or 0}
+
+
+class timedCache(abc.ABC):
+    """
+    In-memory LRU cache of values read from the database. Entries expire
+    after **timeout** seconds so other server processes pick up changes.
+    Subclasses read the missing entries in load.
+    """
+
+    def __init__(self, maxsize=10000, timeout=60):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def load(self, keys):
+        """
+        Returns {key: value} for the keys found in the database.
+        """
+
+    def get_many(self, keys):
+        """
+        Returns {key: value} for the keys found. Missing entries are read
+        with one call to load.
+        """
+        values = {}
+        missing = []
+        now = time.monotonic()
+        with self.lock:
+            for key in set(keys):
+                entry = self.entries.get(key, None)
+                if entry is not None and entry[1] > now:
+                    self.entries.move_to_end(key)
+                    values[key] = entry[0]
+                else:
+                    missing.append(key)
+
+        if missing:
+            loaded = self.load(missing)
+            self.set_many(loaded, now)
+            values.update(loaded)
+
+        return values
+
+    def set_many(self, values, now=None):
+        """
+        Stores {key: value} entries already read by the caller.
+        """
+        expires = (time.monotonic() if now is None else now) + self.timeout
+        with self.lock:
+            for key, value in values.items():
+                self.entries[key] = (value, expires)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class answerKeyCache(timedCache):
+    """
+    Cache of the answer keys used to grade quizzes, by question ID.
+
+    The key of a question is a bitmask of its correct choices (bit i is set
+    when choice i is correct), its number of choices, its integer key,
+    whether its choices are shuffled and its learning outcomes.
+    Questions.save and Questions.delete invalidate their entry.
+    """
+
+    @staticmethod
+    def mask(choiceanswers):
+        return sum(1 << i for i, correct in enumerate(choiceanswers) if correct)
+
+    def load(self, qids):
+        from .models import Questions
+
+        rows = Questions.objects.filter(_id__in=qids).values_list(
+            '_id', 'choiceanswers', 'pk', 'shuffleoption', 'learningoutcome')
+        return {qid: (self.mask(choiceanswers), len(choiceanswers), pk,
+                      shuffleoption, learningoutcome)
+                for qid, choiceanswers, pk, shuffleoption, learningoutcome
+                in rows}
+
+
+class questionIdCache(timedCache):
+    """
+    Cache of the question IDs of integer question keys, used to show the
+    questions of quizzes and the question of ratings, tags and comments by
+    their public ID. Questions.save and Questions.delete invalidate their
+    entry.
+    """
+
+    def load(self, pks):
+        from .models import Questions
+
+        return dict(Questions.objects.filter(
+            pk__in=pks).values_list('pk', '_id'))
+
+
+class topicQuestionCache(timedCache):
+    """
+    Cache of the integer keys of the multiple choice questions of a topic,
+    in key order, from which GenerateQuiz draws its samples. Questions.save
+    and Questions.delete invalidate the entries of their topics.
+    """
+
+    def load(self, topics):
+        from .models import Questions
+
+        pools = {topic: [] for topic in topics}
+        rows = Questions.objects.filter(
+            topic__in=topics, typename="multipleChoice").order_by(
+            'pk').values_list('topic_id', 'pk')
+        for topic, pk in rows:
+            pools[topic].append(pk)
+        return pools
+
 
-        return {'total': total, 'correct': correct}
+answerKeys = answerKeyCache()
+questionIds = questionIdCache()
+topicQuestions = topicQuestionCache()
@@ -0,0 +1,93 @@
+"""
+Measures how many rows per second the Questions, Quiz and Topics lists are
+rendered with their serializers and with the values() read path. Each
+list is read through its view's queryset, with the annotations the endpoint
+adds.
+
+The rows already in the database are used; pass --rows to create that many
+questions, quizzes and topics first, inside a transaction that is rolled back.
+
+Usage: python3 manage.py benchmark_lists [--rows N] [--repeat N]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from Quiz.models import Questions, ReviewQuiz, Topics, Users
+from Quiz.serializers import render_values, values_plan
+from Quiz.views import QuestionViewSet, ReviewQuizViewSet, TopicViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares list rendering through serializers and through values().'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['rows']:
+                    self.create_rows(options['rows'])
+                for view_class in [QuestionViewSet, ReviewQuizViewSet,
+                                   TopicViewSet]:
+                    self.benchmark(view_class, options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def benchmark(self, view_class, repeat):
+        view = view_class()
+        view.request = view.initialize_request(RequestFactory().get('/'))
+        view.format_kwarg = None
+        view.kwargs = {}
+        queryset = view.get_queryset()
+        plan = values_plan(view.get_serializer())
+        columns = [column for name, column, field in plan]
+
+        serializer_time = values_time = 0
+        for i in range(repeat):
+            start = time.perf_counter()
+            view.get_serializer(queryset.all(), many=True).data
+            serializer_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            render_values(plan, queryset.values(*columns))
+            values_time += time.perf_counter() - start
+
+        rows = queryset.count() * repeat
+        self.stdout.write('%-10s %8d rows  serializer %10.0f rows/s  '
+                          'values %10.0f rows/s' % (
+                              queryset.model.__name__, rows / repeat,
+                              rows / serializer_time, rows / values_time))
+
+    def create_rows(self, count):
+        user = Users.objects.create(
+            email='benchmark@example.com', username='benchmark',
+            password='benchmark', salt='benchmark')
+        topics = Topics.objects.bulk_create([
+            Topics(name='Benchmark %d' % i, creator_id=user,
+                   tags=['benchmark'], learningoutcomes=['LO 1', 'LO 2'])
+            for i in range(count)])
+        questions = Questions.objects.bulk_create([
+            Questions(_id='benchmark%d' % i, prompt='Question %d' % i,
+                      choices=['A', 'B', 'C', 'D'],
+                      choiceanswers=[True, False, False, False],
+                      typename='multipleChoice', topic=topics[i % 10],
+                      username=user, learningoutcome=['LO 1'],
+                      feedback=['A', 'B', 'C', 'D'], draft=False,
+                      hidden=False)
+            for i in range(count)], batch_size=1000)
+        ReviewQuiz.objects.bulk_create([
+            ReviewQuiz(_id='benchmark%d' % i, questions=[questions[i].pk],
+                       answers=[1], correct=1, total=1, username=user,
+                       topic=topics[i % 10], correctness=[True])
+            for i in range(count)], batch_size=1000)
@@ -0,0 +1,111 @@
+"""
+Calibrates a Rasch (one parameter logistic) model on the quiz history.
+
+Under the model a user of ability theta answers a question of difficulty b
+correctly with probability 1 / (1 + exp(b - theta)). Abilities and
+difficulties are estimated together by penalised joint maximum likelihood:
+a normal prior keeps the estimates of users or questions with only correct
+(or only wrong) answers finite.
+
+The answers are first written to a response matrix on disk (see
+ResponseMatrix), then every Newton iteration goes over it in chunks of
+``--chunk-size`` answers, so memory stays bounded by the number of users
+and questions. The results are stored in Questions.irt_difficulty and
+Users.irt_ability; questions and users without answers get NULL.
+
+Usage: python3 manage.py calibrate_irt [--iterations 100]
+"""
+
+import tempfile
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Quiz.models import Questions, ReviewQuiz, Users
+from Quiz.responses import ResponseMatrix, response_chunks
+
+
+def calibrate(matrix, chunk_size=1000000, iterations=100, tolerance=1e-3,
+              prior_sd=2.0):
+    """
+    Returns the abilities and difficulties of the users and questions of a
+    ResponseMatrix by ordinal, with the number of iterations run.
+    """
+    users = matrix.load('users')
+    questions = matrix.load('questions')
+    correct = matrix.load('correct')
+    theta = np.zeros(len(matrix.users))
+    b = np.zeros(len(matrix.questions))
+    precision = 1.0 / prior_sd ** 2
+
+    for iteration in range(1, iterations + 1):
+        theta_gradient = -precision * theta
+        theta_hessian = np.full(len(theta), precision)
+        b_gradient = -precision * b
+        b_hessian = np.full(len(b), precision)
+        for start in range(0, matrix.size, chunk_size):
+            u = np.asarray(users[start:start + chunk_size])
+            i = np.asarray(questions[start:start + chunk_size])
+            x = np.asarray(correct[start:start + chunk_size], np.float64)
+            p = 1.0 / (1.0 + np.exp(b[i] - theta[u]))
+            residual = x - p
+            information = p * (1.0 - p)
+            theta_gradient += np.bincount(u, residual, len(theta))
+            theta_hessian += np.bincount(u, information, len(theta))
+            b_gradient -= np.bincount(i, residual, len(b))
+            b_hessian += np.bincount(i, information, len(b))
+
+        theta_step = np.clip(theta_gradient / theta_hessian, -1.0, 1.0)
+        b_step = np.clip(b_gradient / b_hessian, -1.0, 1.0)
+        theta += theta_step
+        b += b_step
+        if max(np.abs(theta_step).max(initial=0),
+               np.abs(b_step).max(initial=0)) < tolerance:
+            break
+    return theta, b, iteration
+
+
+class Command(BaseCommand):
+    help = ('Estimates the Rasch difficulty of questions and ability of '
+            'users from all quizzes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100,
+                            help='Maximum number of Newton iterations.')
+        parser.add_argument('--tolerance', type=float, default=1e-3,
+                            help='Stop when no estimate moves more than this.')
+        parser.add_argument('--prior-sd', type=float, default=2.0,
+                            help='Standard deviation of the normal prior.')
+        parser.add_argument('--chunk-size', type=int, default=1000000,
+                            help='Number of answers processed at a time.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            matrix = ResponseMatrix(directory)
+            for chunk in response_chunks(ReviewQuiz.objects.all()):
+                matrix.append(chunk)
+            theta, b, iterations = calibrate(
+                matrix, options['chunk_size'], options['iterations'],
+                options['tolerance'], options['prior_sd'])
+
+        # Questions deleted since their quizzes were taken have no row
+        existing = set(Questions.objects.filter(
+            pk__in=matrix.questions).values_list('pk', flat=True))
+        questions = [Questions(pk=key, irt_difficulty=float(difficulty))
+                     for key, difficulty in zip(matrix.questions, b)
+                     if key in existing]
+        users = [Users(username=username, irt_ability=float(ability))
+                 for username, ability in zip(matrix.users, theta)]
+        with transaction.atomic():
+            Questions.objects.exclude(irt_difficulty=None).update(
+                irt_difficulty=None)
+            Users.objects.exclude(irt_ability=None).update(irt_ability=None)
+            Questions.objects.bulk_update(questions, ['irt_difficulty'],
+                                          batch_size=1000)
+            Users.objects.bulk_update(users, ['irt_ability'], batch_size=1000)
+
+        self.stdout.write('Calibrated %d questions and %d users from %d '
+                          'answers in %d iterations.'
+                          % (len(questions), len(users), matrix.size,
+                             iterations))
@@ -0,0 +1,93 @@
+"""
+Converts the quizzes table from text arrays to the compact ReviewQuiz
+columns.
+
+Older databases store the answers and correctness of a quiz as text arrays.
+ReviewQuiz now stores an answer as a smallint bitmask of the selected
+choices and the correctness as a bit string. Run this command once before
+``migrate`` on such a database; it does nothing when the table is already
+converted.
+
+An answer equal to the text of a choice of its question becomes that
+choice. Otherwise answers made of comma separated choice indexes (as
+GradeQuiz stores them) keep their choices; any other text, or an answer to a
+deleted question, becomes NULL. Correctness values equal to
+"true" (in any case) become 1 bits, everything else 0 bits. The quizzes may
+refer to questions by text ID or by key (see convert_question_keys), so
+the two commands run in either order.
+
+Usage: python3 manage.py compact_quizzes
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from Quiz.models import Questions, ReviewQuiz
+
+
+# A choice index that fits in a smallint bitmask, 0 to MAX_CHOICES - 1
+INDEX = '(1[0-4]|[0-9])'
+
+CONVERT = '''
+ALTER TABLE {table} ADD COLUMN answers_compact smallint[],
+                    ADD COLUMN correctness_compact varbit;
+UPDATE {table} SET
+    answers_compact = ARRAY(
+        SELECT coalesce(
+            (SELECT (1 << (c.n - 1)::int)::smallint
+             FROM {questions} q,
+                  unnest(q.choices) WITH ORDINALITY AS c(choice, n)
+             WHERE q.{key} = t.question AND c.choice = a
+             AND c.n <= {max_choices}
+             ORDER BY c.n LIMIT 1),
+            CASE
+                WHEN btrim(a) = '' THEN 0
+                WHEN a ~ '^{index}(,{index})*$' THEN (
+                    SELECT bit_or(1 << i::int)::smallint
+                    FROM unnest(string_to_array(a, ',')) AS i)
+            END)
+        FROM unnest(answers, questions) WITH ORDINALITY AS t(a, question, n)
+        ORDER BY n),
+    correctness_compact = array_to_string(ARRAY(
+        SELECT CASE WHEN lower(c) = 'true' THEN '1' ELSE '0' END
+        FROM unnest(correctness) WITH ORDINALITY AS t(c, n) ORDER BY n),
+        '')::varbit;
+ALTER TABLE {table} DROP COLUMN answers, DROP COLUMN correctness;
+ALTER TABLE {table} RENAME COLUMN answers_compact TO answers;
+ALTER TABLE {table} RENAME COLUMN correctness_compact TO correctness;
+ALTER TABLE {table} ALTER COLUMN answers SET NOT NULL,
+                    ALTER COLUMN correctness SET NOT NULL;
+'''
+
+
+class Command(BaseCommand):
+    help = ('Converts the answers and correctness of stored quizzes to '
+            'bitmasks and bit strings.')
+
+    def handle(self, *args, **options):
+        table = ReviewQuiz._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT udt_name FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = 'correctness' "
+                "AND table_schema = current_schema()", [table])
+            row = cursor.fetchone()
+            if row is None or row[0] != '_text':
+                self.stdout.write('The %s table is already compact.' % table)
+                return
+
+            cursor.execute(
+                "SELECT udt_name FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = 'questions' "
+                "AND table_schema = current_schema()", [table])
+            key = '_id' if cursor.fetchone()[0] == '_text' else 'id'
+            cursor.execute(CONVERT.format(
+                table=connection.ops.quote_name(table), index=INDEX,
+                questions=connection.ops.quote_name(
+                    Questions._meta.db_table),
+                key=key, max_choices=ReviewQuiz.MAX_CHOICES))
+            cursor.execute('SELECT count(*) FROM %s'
+                           % connection.ops.quote_name(table))
+            count = cursor.fetchone()[0]
+
+        self.stdout.write('Converted %d quizzes.' % count)
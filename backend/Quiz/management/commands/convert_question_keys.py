@@ -0,0 +1,107 @@
+"""
+Converts a database whose questions are keyed by their text ``_id`` to the
+integer question keys.
+
+Questions now have an integer **id** primary key and keep ``_id`` as a
+unique public identifier. Run this command once before ``migrate`` on an
+older database. It numbers the existing questions, rewrites every foreign
+key to questions (ratings, tags, learning outcomes, comments, mastery) and
+the question arrays of quizzes and staged quizzes to the new keys, then
+moves the primary key. It does nothing when the table is already converted.
+
+Quiz arrays may hold IDs of questions deleted since; those become NULL.
+
+Usage: python3 manage.py convert_question_keys
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from Quiz.models import Questions, ReviewQuiz, StagedQuiz
+
+
+FUNCTIONS = '''
+CREATE FUNCTION pg_temp.question_key(text) RETURNS integer
+    LANGUAGE sql STABLE AS $$ SELECT id FROM {table} WHERE _id = $1 $$;
+CREATE FUNCTION pg_temp.question_keys(text[]) RETURNS integer[]
+    LANGUAGE sql STABLE AS $$
+    SELECT coalesce(array_agg(q.id ORDER BY u.n), '{{}}')
+    FROM unnest($1) WITH ORDINALITY AS u(qid, n)
+    LEFT JOIN {table} q ON q._id = u.qid $$;
+'''
+
+# Foreign keys to questions, with their table and column number
+REFERENCES = '''
+SELECT c.conname, c.conrelid::regclass::text, a.attname, a.attnum
+FROM pg_constraint c
+JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+WHERE c.contype = 'f' AND c.confrelid = %s::regclass
+'''
+
+# Indexes for LIKE lookups, which only apply to text columns
+PATTERN_INDEXES = '''
+SELECT i.indexrelid::regclass::text
+FROM pg_index i JOIN pg_opclass o ON o.oid = i.indclass[0]
+WHERE i.indrelid = %s::regclass AND i.indkey[0] = %s
+AND o.opcname IN ('text_pattern_ops', 'varchar_pattern_ops')
+'''
+
+
+class Command(BaseCommand):
+    help = ('Gives questions integer keys and converts the tables that '
+            'refer to them.')
+
+    def handle(self, *args, **options):
+        table = Questions._meta.db_table
+        quote = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as cursor:
+            columns = [column.name for column in
+                       connection.introspection.get_table_description(
+                           cursor, table)]
+            if 'id' in columns:
+                self.stdout.write('The %s table already has integer keys.'
+                                  % table)
+                return
+
+            cursor.execute(REFERENCES, [table])
+            references = cursor.fetchall()
+            for name, referencing, column, number in references:
+                cursor.execute('ALTER TABLE %s DROP CONSTRAINT %s'
+                               % (quote(referencing), quote(name)))
+                cursor.execute(PATTERN_INDEXES, [referencing, number])
+                for (index,) in cursor.fetchall():
+                    cursor.execute('DROP INDEX %s' % index)
+
+            cursor.execute('ALTER TABLE %s ADD COLUMN id serial'
+                           % quote(table))
+            cursor.execute(FUNCTIONS.format(table=quote(table)))
+            for name, referencing, column, number in references:
+                cursor.execute(
+                    'ALTER TABLE %s ALTER COLUMN %s TYPE integer '
+                    'USING pg_temp.question_key(%s)'
+                    % (quote(referencing), quote(column), quote(column)))
+            for model in (ReviewQuiz, StagedQuiz):
+                cursor.execute(
+                    'ALTER TABLE %s ALTER COLUMN questions TYPE integer[] '
+                    'USING pg_temp.question_keys(questions)'
+                    % quote(model._meta.db_table))
+
+            cursor.execute(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+            primary_key = cursor.fetchone()[0]
+            cursor.execute(
+                'ALTER TABLE %s DROP CONSTRAINT %s, ADD PRIMARY KEY (id), '
+                'ADD UNIQUE (_id)' % (quote(table), quote(primary_key)))
+            for name, referencing, column, number in references:
+                cursor.execute(
+                    'ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) '
+                    'REFERENCES %s (id) DEFERRABLE INITIALLY DEFERRED'
+                    % (quote(referencing), quote(name), quote(column),
+                       quote(table)))
+
+            cursor.execute('SELECT count(*) FROM %s' % quote(table))
+            count = cursor.fetchone()[0]
+
+        self.stdout.write('Numbered %d questions and converted %d foreign '
+                          'keys.' % (count, len(references)))
@@ -0,0 +1,68 @@
+"""
+Exports the quiz history as a response matrix of users by questions for
+analytics.
+
+The matrix is written to a directory as raw arrays in coordinate form, one
+entry per answer (see ResponseMatrix):
+
+- **users.int32**: Ordinal of the user who gave the answer.
+- **questions.int32**: Ordinal of the question answered.
+- **correct.uint8**: 1 when answered correctly.
+
+matrix.json holds the lookup tables: ``users`` lists the usernames by
+ordinal, ``question_ids`` the question IDs by ordinal (null for questions
+deleted before their first export) and ``questions`` the internal question
+keys. The arrays load with no parsing, e.g.
+``np.memmap('users.int32', dtype=np.int32, mode='r')``, or into a
+``scipy.sparse.coo_matrix((correct, (users, questions)))``.
+
+Each run closes a quiz batch (see ReviewQuiz.close_batch) and appends only
+the batches taken since the previous export to the directory.
+``--rebuild`` starts the export over.
+
+Usage: python3 manage.py export_responses <directory> [--rebuild]
+"""
+
+import os
+
+from django.core.management.base import BaseCommand
+
+from Quiz.models import Questions, ReviewQuiz
+from Quiz.responses import ResponseMatrix, response_chunks
+
+
+class Command(BaseCommand):
+    help = ('Appends the quizzes taken since the last export to a response '
+            'matrix on disk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Remove the existing export first.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        matrix = ResponseMatrix(options['directory'])
+        if options['rebuild']:
+            matrix.clear()
+        size = matrix.size
+
+        last = ReviewQuiz.close_batch()
+        quizzes = ReviewQuiz.objects.filter(
+            batch__gt=matrix.info.get('batch', 0), batch__lte=last)
+        for chunk in response_chunks(quizzes, options['chunk_size']):
+            matrix.append(chunk)
+
+        question_ids = matrix.info.setdefault('question_ids', [])
+        added = matrix.questions[len(question_ids):]
+        public = dict(Questions.objects.filter(pk__in=added).values_list(
+            'pk', '_id'))
+        question_ids.extend(public.get(key, None) for key in added)
+        matrix.info['batch'] = last
+        matrix.save()
+
+        self.stdout.write('Appended %d answers; the matrix has %d answers of '
+                          '%d users to %d questions.'
+                          % (matrix.size - size, matrix.size,
+                             len(matrix.users), len(matrix.questions)))
@@ -0,0 +1,177 @@
+"""
+Computes the classical item analysis of questions into ItemStatistics.
+
+For every question this keeps the difficulty (share of correct answers),
+the discrimination (point-biserial correlation between answering the
+question correctly and the rest score of the quiz) and how often each
+choice was selected. Quizzes are read as a sparse response matrix and
+aggregated with NumPy, a chunk of quizzes at a time.
+
+Each run closes a quiz batch (see ReviewQuiz.close_batch) and only reads
+the batches taken since the previous run, adding them to the stored sums.
+Run it periodically, e.g. from cron. ``--rebuild`` recomputes everything
+from all quizzes.
+
+Usage: python3 manage.py item_analysis [--rebuild]
+"""
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Func, IntegerField
+
+from Quiz.models import BatchProgress, ItemStatistics, Questions, ReviewQuiz
+from Quiz.responses import response_chunks
+
+# The summed columns of ItemStatistics, besides choices
+SUMS = ['attempts', 'correct', 'scored', 'scored_correct', 'rest_sum',
+        'rest_squares', 'rest_products']
+
+
+def analyse(chunk):
+    """
+    Returns the question keys of a ResponseChunk with, per question, an
+    array for each of SUMS and an array of choice selection counts.
+    """
+    questions, column = np.unique(chunk.question, return_inverse=True)
+    size = len(questions)
+
+    correct = chunk.correct.astype(np.float64)
+    length = chunk.lengths[chunk.quiz]
+    # The share of the other questions of the quiz answered correctly
+    scored = (length > 1).astype(np.float64)
+    rest = scored * (chunk.scores[chunk.quiz] - correct) \
+        / np.maximum(length - 1, 1)
+
+    def total(weights=None):
+        return np.bincount(column, weights=weights, minlength=size)
+
+    sums = {
+        'attempts': total(),
+        'correct': total(correct),
+        'scored': total(scored),
+        'scored_correct': total(scored * correct),
+        'rest_sum': total(rest),
+        'rest_squares': total(rest * rest),
+        'rest_products': total(rest * correct),
+    }
+
+    answered = chunk.answer >= 0
+    choices = np.zeros((size, ReviewQuiz.MAX_CHOICES))
+    for index in range(ReviewQuiz.MAX_CHOICES):
+        choices[:, index] = total(answered & (chunk.answer >> index & 1 == 1))
+    return questions, sums, choices
+
+
+def combine(parts):
+    """
+    Adds up the results of analyse for several chunks.
+    """
+    questions, column = np.unique(
+        np.concatenate([part[0] for part in parts]), return_inverse=True)
+    size = len(questions)
+    sums = {name: np.bincount(column, minlength=size, weights=np.concatenate(
+        [part[1][name] for part in parts])) for name in SUMS}
+    choices = np.zeros((size, ReviewQuiz.MAX_CHOICES))
+    np.add.at(choices, column, np.concatenate([part[2] for part in parts]))
+    return questions, sums, choices
+
+
+def derive(sums):
+    """
+    Returns the difficulty and discrimination arrays of summed columns, NaN
+    where they are undefined.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difficulty = sums['correct'] / sums['attempts']
+        count = sums['scored']
+        p = sums['scored_correct'] / count
+        mean = sums['rest_sum'] / count
+        covariance = sums['rest_products'] / count - p * mean
+        variance = p * (1 - p) * (sums['rest_squares'] / count - mean * mean)
+        discrimination = np.where(variance > 1e-12,
+                                  covariance / np.sqrt(variance), np.nan)
+    return difficulty, discrimination
+
+
+def nullable(value):
+    return None if np.isnan(value) else float(value)
+
+
+class Command(BaseCommand):
+    help = ('Updates the difficulty, discrimination and choice counts of '
+            'questions with the quizzes taken since the last run.')
+
+    job = 'item_analysis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute from all quizzes.')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        last = ReviewQuiz.close_batch()
+        with transaction.atomic():
+            BatchProgress.objects.get_or_create(job=self.job)
+            # Locks out concurrent runs, which would count batches twice
+            progress = BatchProgress.objects.select_for_update().get(
+                job=self.job)
+            if options['rebuild']:
+                ItemStatistics.objects.all().delete()
+                progress.batch = 0
+
+            quizzes = ReviewQuiz.objects.filter(
+                batch__gt=progress.batch, batch__lte=last)
+            parts = [analyse(chunk) for chunk in response_chunks(
+                quizzes, options['chunk_size']) if len(chunk)]
+            updated = self.store(combine(parts)) if parts else 0
+
+            progress.batch = last
+            progress.save()
+
+        self.stdout.write('Updated the item statistics of %d questions.'
+                          % updated)
+
+    def store(self, result):
+        """
+        Adds new sums to the stored ones and writes the rows back, with two
+        queries to read and one bulk write per kind of change.
+        """
+        questions, sums, choices = result
+        keys = [int(pk) for pk in questions]
+        # Questions deleted since their quizzes were taken have no row
+        counts = dict(Questions.objects.filter(pk__in=keys).annotate(
+            count=Func(F('choices'), function='cardinality',
+                       output_field=IntegerField())).values_list('pk', 'count'))
+        existing = ItemStatistics.objects.in_bulk(keys)
+        for name in SUMS:
+            sums[name] = sums[name] + np.array(
+                [getattr(existing[pk], name) if pk in existing else 0
+                 for pk in keys], dtype=np.float64)
+        for row, pk in enumerate(keys):
+            if pk in existing:
+                stored = existing[pk].choices
+                choices[row, :len(stored)] += stored
+        difficulty, discrimination = derive(sums)
+
+        created = []
+        updated = []
+        for row, pk in enumerate(keys):
+            if pk not in counts:
+                continue
+            item = existing.get(pk, None) or ItemStatistics(qid_id=pk)
+            for name in SUMS:
+                value = sums[name][row]
+                setattr(item, name, float(value) if name.startswith('rest')
+                        else int(value))
+            item.choices = [int(count) for count in
+                            choices[row, :counts[pk] or 0]]
+            item.difficulty = nullable(difficulty[row])
+            item.discrimination = nullable(discrimination[row])
+            (updated if pk in existing else created).append(item)
+
+        ItemStatistics.objects.bulk_create(created, batch_size=1000)
+        ItemStatistics.objects.bulk_update(
+            updated, SUMS + ['choices', 'difficulty', 'discrimination'],
+            batch_size=1000)
+        return len(created) + len(updated)
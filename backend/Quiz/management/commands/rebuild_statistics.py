@@ -0,0 +1,115 @@
+"""
+Rebuilds the running quiz totals kept in TopicStatistics, QuestionMastery
+and OutcomeMastery, and the rating totals kept on Questions.
+
+ReviewQuiz.save and QuestionRatings.save keep the totals up to date as rows
+are written. This command recomputes them from the quizzes and
+questionratings tables, for example to backfill an existing database or to
+repair totals after rows were edited by hand.
+
+Usage: python3 manage.py rebuild_statistics
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from Quiz.models import (OutcomeMastery, QuestionMastery, QuestionRatings,
+                         Questions, ReviewQuiz, TopicStatistics, Users)
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the per-user quiz statistics, the mastery tables and '
+            'the question rating totals.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            TopicStatistics.objects.all().delete()
+            totals = ReviewQuiz.objects.values('username', 'topic').annotate(
+                quiz_total=Sum('total'), quiz_correct=Sum('correct'),
+                quiz_attempts=Count('_id'))
+            TopicStatistics.objects.bulk_create([
+                TopicStatistics(
+                    username_id=item['username'], topic_id=item['topic'],
+                    total=item['quiz_total'], correct=item['quiz_correct'],
+                    attempts=item['quiz_attempts'])
+                for item in totals.iterator()
+            ], batch_size=1000)
+
+            ratings = QuestionRatings.objects.filter(
+                qid=OuterRef('pk')).order_by().values('qid')
+            Questions.objects.update(
+                rating_sum=Coalesce(Subquery(ratings.annotate(
+                    s=Sum('rating')).values('s')), 0),
+                rating_count=Coalesce(Subquery(ratings.annotate(
+                    c=Count('id')).values('c')), 0))
+
+            self.rebuild_mastery()
+
+        self.stdout.write('Rebuilt statistics for %d user/topic pairs.'
+                          % TopicStatistics.objects.count())
+
+    def rebuild_mastery(self):
+        """
+        The quizzes of each user are numbered in the order they were saved,
+        as ReviewQuiz.save numbers them, to find the last quiz each question
+        was seen in. Quizzes saved before created_at was added come first,
+        in batch order (see ReviewQuiz.close_batch), then by ID.
+        """
+        QuestionMastery.objects.all().delete()
+        OutcomeMastery.objects.all().delete()
+
+        # (username, topic, qid) -> [attempts, correct]
+        answers = {}
+        # username -> quizzes taken, (username, qid) -> last quiz
+        taken = {}
+        last_quiz = {}
+        quizzes = ReviewQuiz.objects.only(
+            'username', 'topic', 'questions', 'correctness').order_by(
+            'username', F('created_at').asc(nulls_first=True), 'batch', 'pk')
+        for quiz in quizzes.iterator(chunk_size=1000):
+            taken[quiz.username_id] = taken.get(quiz.username_id, 0) + 1
+            for qid, correct in dict(quiz.answered()).items():
+                key = (quiz.username_id, quiz.topic_id, qid)
+                totals = answers.setdefault(key, [0, 0])
+                totals[0] += 1
+                totals[1] += int(correct)
+                last_quiz[(quiz.username_id, qid)] = taken[quiz.username_id]
+
+        Users.objects.update(quizzes_taken=0)
+        Users.objects.bulk_update(
+            [Users(username=username, quizzes_taken=count)
+             for username, count in taken.items()],
+            ['quizzes_taken'], batch_size=1000)
+
+        outcomes = dict(Questions.objects.filter(
+            pk__in=set(qid for username, topic, qid in answers)
+        ).values_list('pk', 'learningoutcome'))
+
+        questions = {}
+        topics = {}
+        for (username, topic, qid), (attempts, correct) in answers.items():
+            if qid not in outcomes:
+                continue
+            totals = questions.setdefault((username, qid), [0, 0])
+            totals[0] += attempts
+            totals[1] += correct
+            for outcome in set(outcomes[qid]):
+                totals = topics.setdefault((username, topic, outcome), [0, 0])
+                totals[0] += attempts
+                totals[1] += correct
+
+        QuestionMastery.objects.bulk_create([
+            QuestionMastery(username_id=username, qid_id=qid,
+                            attempts=attempts, correct=correct,
+                            last_quiz=last_quiz[(username, qid)])
+            for (username, qid), (attempts, correct) in questions.items()
+        ], batch_size=1000)
+        OutcomeMastery.objects.bulk_create([
+            OutcomeMastery(username_id=username, topic_id=topic,
+                           learningoutcome=outcome,
+                           attempts=attempts, correct=correct)
+            for (username, topic, outcome), (attempts, correct)
+            in topics.items()
+        ], batch_size=1000)
@@ -0,0 +1,81 @@
+"""
+Checks the question counts kept in QuestionCounts against the questions
+table and repairs the rows that drifted.
+
+Questions.save and Questions.delete keep the counts up to date, but writes
+that bypass them (``QuerySet.update``, edits by hand, a database restored
+from before the table existed) leave them wrong. This command recounts the
+questions per topic, learning outcome, draft and hidden state in one query,
+reports every row that differs and fixes it. Questions are locked against
+writes while it runs. Run it once to fill the table on an existing
+database, and periodically after that.
+
+With ``--check`` it only reports, and fails when any row drifted.
+
+Usage: python3 manage.py reconcile_question_counts [--check]
+"""
+
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from Quiz.models import QuestionCounts, Questions
+
+
+# Every question counts once in its topic row (empty learning outcome) and
+# once per learning outcome, as in QuestionCounts.keys
+COUNT = '''
+SELECT q.topic_id, coalesce(o.outcome, ''), q.draft, q.hidden, count(*)
+FROM {questions} q
+CROSS JOIN LATERAL (
+    SELECT NULL::text
+    UNION ALL
+    SELECT outcome FROM unnest(q.learningoutcome) AS u(outcome)
+    WHERE outcome <> ''
+) AS o(outcome)
+GROUP BY 1, 2, 3, 4
+'''
+
+
+class Command(BaseCommand):
+    help = ('Recounts the questions per topic and learning outcome and '
+            'repairs QuestionCounts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drifted rows.')
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(Questions._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE %s IN SHARE MODE' % table)
+            cursor.execute(COUNT.format(questions=table))
+            expected = {tuple(row[:4]): row[4] for row in cursor.fetchall()}
+            stored = {tuple(row[:4]): row[4] for row in
+                      QuestionCounts.objects.values_list(
+                          'topic_id', 'learningoutcome', 'draft', 'hidden',
+                          'count')}
+
+            changes = Counter()
+            for key in sorted(set(expected) | set(stored)):
+                change = expected.get(key, 0) - stored.get(key, 0)
+                if change:
+                    changes[key] = change
+                    self.stdout.write(
+                        '%s / %s (draft=%s, hidden=%s): counted %d, '
+                        'expected %d' % (key[0], key[1] or '*', key[2],
+                                         key[3], stored.get(key, 0),
+                                         expected.get(key, 0)))
+
+            if options['check']:
+                if changes:
+                    raise CommandError('%d question counts are out of date.'
+                                       % len(changes))
+                self.stdout.write('The question counts are up to date.')
+                return
+
+            QuestionCounts.record(changes)
+            QuestionCounts.objects.filter(count=0).delete()
+
+        self.stdout.write('Repaired %d question counts.' % len(changes))
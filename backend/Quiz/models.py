@@ -1,10 +1,41 @@
 #import jwt
 
+from collections import Counter
 from datetime import datetime, timedelta
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+
+from .helperClasses import answerKeys, questionIds, topicQuestions
+
+# === Compact Fields ===
+
+
+class BitVectorField(models.Field):
+    """
+    Stores a list of booleans as a PostgreSQL bit varying, one bit per value.
+    """
+    description = 'List of booleans stored as bits'
+
+    def db_type(self, connection):
+        return 'varbit'
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        return [bit == '1' for bit in value]
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return ''.join('1' if bit else '0' for bit in value)
 
 # === Models for Quiz App ===
 
@@ -16,7 +47,8 @@ class Questions(models.Model):
     The Question class defines the main storage point for questions.
     Each question has twelve fields:
 
-    - **_id**: Stores the unique identifier of a question.
+    - **id**: Stores the integer key of a question, used by other tables.
+    - **_id**: Stores the unique public identifier of a question.
     - **prompt**: Stores the prompt of the question.
     - **shuffleOption**: Used to control if the answers choices are shuffled.
     - **learningOutCome**: Stores a list of learning outcome associated with the question.
@@ -28,9 +60,25 @@ class Questions(models.Model):
     - **feedback**: Stores the feedback for each choice.
     - **draft**: Used to control if the question will appear in quizzes.
     - **hidden**: Used to control if the question is displayed to users.
+    - **rating_sum**: Stores the sum of all ratings given to the question.
+    - **rating_count**: Stores the number of ratings given to the question.
+    - **irt_difficulty**: Stores the Rasch difficulty of the question, set
+      by the ``calibrate_irt`` command.
+
+    The rating columns are maintained by QuestionRatings, so the average
+    rating of a question is read from its own row. The learning outcomes
+    have a GIN index so questions can be sampled per outcome.
+
+    Saving or deleting a question keeps QuestionCounts up to date.
+
+    Other tables and the quiz arrays refer to questions by **id**, which
+    keeps their indexes and joins small; the API still shows **_id**.
+    Databases created with **_id** as the primary key are converted by the
+    ``convert_question_keys`` command.
     """
 
-    _id = models.TextField(primary_key=True, null=False)
+    id = models.AutoField(primary_key=True)
+    _id = models.TextField(unique=True, null=False)
     prompt = models.TextField(null=False)
     shuffleoption = models.BooleanField(null=False, default=False)
     choices = ArrayField(models.TextField())
@@ -42,10 +90,63 @@ class Questions(models.Model):
     feedback = ArrayField(models.TextField(null=True), null=True)
     draft = models.BooleanField(null=False)
     hidden = models.BooleanField(null=False)
+    rating_sum = models.IntegerField(null=False, default=0)
+    rating_count = models.IntegerField(null=False, default=0)
+    irt_difficulty = models.FloatField(null=True)
     # comments = ArrayField(models.TextField())
 
     class Meta:
         db_table = "questions"
+        indexes = [
+            GinIndex(fields=['learningoutcome']),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the question, moves it between QuestionCounts rows and drops
+        its cached answer key, ID and topic pool.
+        """
+        with transaction.atomic():
+            old = None
+            if self.pk is not None:
+                # Locked so concurrent saves count from the same old values
+                old = Questions.objects.select_for_update().filter(
+                    pk=self.pk).values_list(
+                    'topic_id', 'learningoutcome', 'draft', 'hidden').first()
+            super().save(*args, **kwargs)
+            changes = QuestionCounts.changes([self])
+            if old is not None:
+                changes.subtract(QuestionCounts.keys(*old))
+            QuestionCounts.record(changes)
+        answerKeys.invalidate(self._id)
+        questionIds.invalidate(self.pk)
+        topicQuestions.invalidate(self.topic_id)
+        if old is not None:
+            topicQuestions.invalidate(old[0])
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the question, takes it out of QuestionCounts and drops its
+        cached answer key, ID and topic pool. The counts are taken from the
+        row as stored, which may differ from this instance.
+        """
+        pk = self.pk
+        with transaction.atomic():
+            # Locked so concurrent saves cannot change what is counted
+            old = Questions.objects.select_for_update().filter(
+                pk=pk).values_list(
+                'topic_id', 'learningoutcome', 'draft', 'hidden').first()
+            result = super().delete(*args, **kwargs)
+            if old is not None:
+                changes = Counter()
+                changes.subtract(QuestionCounts.keys(*old))
+                QuestionCounts.record(changes)
+        answerKeys.invalidate(self._id)
+        questionIds.invalidate(pk)
+        topicQuestions.invalidate(self.topic_id)
+        if old is not None:
+            topicQuestions.invalidate(old[0])
+        return result
 
 
 class UserManager(BaseUserManager):
@@ -90,6 +191,10 @@ class Users(AbstractBaseUser):
     professor = models.BooleanField(default=False)
     admin = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Number of quizzes taken, used to number them for QuestionMastery
+    quizzes_taken = models.IntegerField(default=0)
+    # Rasch ability, set by the calibrate_irt command
+    irt_ability = models.FloatField(null=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -198,26 +303,455 @@ class ReviewQuiz(models.Model):
     Each review quiz has eight fields:
 
     - **_id**: Stores the unique idenfier of a completed quiz.
-    - **questions**: Stores an array of question IDs.
-    - **answers**: Stores an array of answers selected by the Student.
+    - **questions**: Stores an array of question keys (Questions.id).
+    - **answers**: Stores, for each question, a bitmask of the choices
+      selected by the Student (bit i is set when choice i is selected).
     - **correct**: Stores an integer of the amount of question the Student got correct in the quiz.
     - **total**: Stores an integer of the amount of questions in the quiz.
     - **username**: Stores the username who took the quiz.
     - **topic**: Stores the topic associated with the quiz.
-    - **correctness**: Stores an array of correctness of each question in the quiz.
+    - **correctness**: Stores one bit per question, set when it was
+      answered correctly.
+    - **batch**: Stores the number of the batch the quiz was closed in, or
+      NULL for quizzes taken since the last batch.
+    - **created_at**: Stores when the quiz was saved, or NULL for quizzes
+      saved before the column was added.
+
+    Answers are kept as small integers and correctness as a bit string so
+    this table, which grows with every quiz taken, stays small. The REST
+    API still shows them as strings through ReviewQuizSerializer. Answers
+    may still be given as text, either the text of a choice, as quizzes
+    stored them before, or comma separated choice indexes; save turns them
+    into bitmasks. Tables created with the older
+    text arrays are converted by the ``compact_quizzes`` command.
     """
+    # Choices that fit in the bitmask of a smallint answer
+    MAX_CHOICES = 15
 
     _id = models.TextField(primary_key=True)
-    questions = ArrayField(models.TextField())
-    answers = ArrayField(models.TextField())
+    questions = ArrayField(models.IntegerField(null=True))
+    answers = ArrayField(models.SmallIntegerField(null=True))
     correct = models.IntegerField(null=False, default=1)
     total = models.IntegerField(null=False)
     username = models.ForeignKey('Users', on_delete=models.PROTECT)
     topic = models.ForeignKey('Topics', on_delete=models.PROTECT)
-    correctness = ArrayField(models.TextField())
+    correctness = BitVectorField()
+    batch = models.IntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
 
     class Meta:
         db_table = 'quizzes'
+        indexes = [
+            models.Index(fields=['batch']),
+        ]
+
+    def save(self, *args, learningoutcomes=None, **kwargs):
+        """
+        Saves the quiz. A new quiz is also added to the running totals in
+        TopicStatistics, QuestionMastery and OutcomeMastery within the same
+        transaction. Callers that know the learning outcomes of the
+        questions can pass them (see QuestionMastery.record).
+        """
+        adding = self._state.adding
+        self.answers = self.resolve_answers(self.questions, self.answers)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                TopicStatistics.record(self)
+                QuestionMastery.record(self, learningoutcomes)
+
+    def answered(self):
+        """
+        Returns the (question key, answered correctly) pairs of the quiz.
+        """
+        return list(zip(self.questions, self.correctness))
+
+    @classmethod
+    def close_batch(cls):
+        """
+        Puts every quiz taken since the last batch into a new batch and
+        returns the number of the last batch. Batch jobs read the quizzes of
+        the batches they have not seen yet, so each quiz is read once.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Batches are numbered one at a time
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))",
+                               [cls._meta.db_table + '.batch'])
+            last = cls.objects.aggregate(
+                last=models.Max('batch'))['last'] or 0
+            if cls.objects.filter(batch__isnull=True).update(batch=last + 1):
+                last += 1
+        return last
+
+    @classmethod
+    def encode_answer(cls, selected):
+        """
+        Returns the bitmask of a list of selected choice indexes. Raises
+        ValueError for indexes that do not fit.
+        """
+        mask = 0
+        for index in selected:
+            if not 0 <= index < cls.MAX_CHOICES:
+                raise ValueError('Choice index out of range: %s' % index)
+            mask |= 1 << index
+        return mask
+
+    @classmethod
+    def resolve_answers(cls, questions, answers):
+        """
+        Returns the answers with every answer given as text replaced by a
+        bitmask: the bit of the choice of its question with that text or,
+        when no choice has that text, the bits of its comma separated choice
+        indexes. Other text becomes NULL. Raises ValueError for indexes that
+        do not fit.
+        """
+        texts = [(n, question) for n, (question, answer) in
+                 enumerate(zip(questions, answers))
+                 if isinstance(answer, str)]
+        if not texts:
+            return answers
+        choices = dict(Questions.objects.filter(
+            pk__in=[question for n, question in texts]).values_list(
+                'pk', 'choices'))
+        answers = list(answers)
+        for n, question in texts:
+            options = choices.get(question, [])[:cls.MAX_CHOICES]
+            if answers[n] in options:
+                answers[n] = 1 << options.index(answers[n])
+                continue
+            try:
+                selected = [int(i) for i in answers[n].split(',')
+                            if i.strip()]
+            except ValueError:
+                answers[n] = None
+                continue
+            answers[n] = cls.encode_answer(selected)
+        return answers
+
+    @staticmethod
+    def decode_answer(mask):
+        """
+        Returns the sorted choice indexes set in a bitmask.
+        """
+        return [index for index in range(mask.bit_length())
+                if mask >> index & 1]
+
+# === Staged Quiz Model ===
+
+
+class StagedQuiz(models.Model):
+    """
+    The StagedQuiz class stores a quiz generated ahead of time for a student,
+    so a whole class section can be served without generating quizzes at the
+    same moment.
+    Each staged quiz has four fields:
+
+    - **_id**: Stores the unique identifier of the staged quiz.
+    - **topic**: Stores the topic of the quiz.
+    - **username**: Stores the username the quiz was staged for.
+    - **questions**: Stores an array of question keys (Questions.id).
+    """
+    _id = models.TextField(primary_key=True)
+    topic = models.ForeignKey('Topics', on_delete=models.CASCADE)
+    username = models.ForeignKey('Users', on_delete=models.CASCADE)
+    questions = ArrayField(models.IntegerField(null=True))
+
+    class Meta:
+        db_table = 'stagedquizzes'
+
+# === Topic Statistics Model ===
+
+
+class TopicStatistics(models.Model):
+    """
+    The TopicStatistics class keeps the running quiz totals of a user for a
+    topic, so statistics can be read without scanning every quiz.
+    Each row has five fields:
+
+    - **username**: Stores the username who took the quizzes.
+    - **topic**: Stores the topic of the quizzes.
+    - **total**: Stores the number of questions answered.
+    - **correct**: Stores the number of questions answered correctly.
+    - **attempts**: Stores the number of quizzes taken.
+
+    Rows are maintained by ReviewQuiz.save and can be rebuilt from the
+    quizzes table with the ``rebuild_statistics`` command.
+    """
+    username = models.ForeignKey('Users', on_delete=models.CASCADE)
+    topic = models.ForeignKey('Topics', on_delete=models.CASCADE)
+    total = models.IntegerField(null=False, default=0)
+    correct = models.IntegerField(null=False, default=0)
+    attempts = models.IntegerField(null=False, default=0)
+
+    class Meta:
+        db_table = 'topicstatistics'
+        unique_together = (("username", "topic"),)
+
+    @classmethod
+    def record(cls, quiz):
+        """
+        Adds the score of a quiz to the totals of its user and topic,
+        creating the row if needed, with one query.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {table} '
+                '(username_id, topic_id, total, correct, attempts) '
+                'VALUES (%s, %s, %s, %s, 1) '
+                'ON CONFLICT (username_id, topic_id) DO UPDATE SET '
+                'total = {table}.total + EXCLUDED.total, '
+                'correct = {table}.correct + EXCLUDED.correct, '
+                'attempts = {table}.attempts + 1'.format(
+                    table=connection.ops.quote_name(cls._meta.db_table)),
+                [quiz.username_id, quiz.topic_id, quiz.total, quiz.correct])
+
+
+# === Question Count Model ===
+
+
+class QuestionCounts(models.Model):
+    """
+    The QuestionCounts class keeps how many questions each topic has, so
+    screens can show counts without scanning the questions table. Each row
+    has five fields:
+
+    - **topic**: Stores the topic of the questions.
+    - **learningoutcome**: Stores the learning outcome of the questions, or
+      an empty string for the row counting every question of the topic.
+    - **draft**: Stores the draft state of the questions.
+    - **hidden**: Stores the hidden state of the questions.
+    - **count**: Stores the number of questions.
+
+    Rows are maintained by Questions.save and Questions.delete (and by
+    QuestionImport for its bulk inserts) and can be checked and repaired
+    with the ``reconcile_question_counts`` command.
+    """
+    topic = models.ForeignKey('Topics', on_delete=models.CASCADE)
+    learningoutcome = models.TextField(null=False)
+    draft = models.BooleanField(null=False)
+    hidden = models.BooleanField(null=False)
+    count = models.IntegerField(null=False, default=0)
+
+    class Meta:
+        db_table = 'questioncounts'
+        unique_together = (("topic", "learningoutcome", "draft", "hidden"),)
+
+    @staticmethod
+    def keys(topic_id, learningoutcome, draft, hidden):
+        """
+        Returns the (topic, learningoutcome, draft, hidden) keys of the rows
+        a question with these values counts in.
+        """
+        return [(topic_id, '', draft, hidden)] + [
+            (topic_id, outcome, draft, hidden)
+            for outcome in learningoutcome if outcome]
+
+    @classmethod
+    def changes(cls, questions, sign=1):
+        """
+        Returns a Counter of the changes to the rows for adding (or, with a
+        **sign** of -1, removing) questions.
+        """
+        changes = Counter()
+        for question in questions:
+            for key in cls.keys(question.topic_id, question.learningoutcome,
+                                question.draft, question.hidden):
+                changes[key] += sign
+        return changes
+
+    @classmethod
+    def record(cls, changes):
+        """
+        Adds a Counter of changes to the rows, creating missing rows, with
+        one query. Rows are written in key order so concurrent writers do
+        not deadlock.
+        """
+        rows = sorted((key, change) for key, change in changes.items()
+                      if change)
+        if not rows:
+            return
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {table} '
+                '(topic_id, learningoutcome, draft, hidden, count) '
+                'VALUES {values} '
+                'ON CONFLICT (topic_id, learningoutcome, draft, hidden) '
+                'DO UPDATE SET count = {table}.count + EXCLUDED.count'.format(
+                    table=table,
+                    values=', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))),
+                [value for key, change in rows for value in key + (change,)])
+
+
+# === Mastery Models ===
+
+
+class QuestionMastery(models.Model):
+    """
+    The QuestionMastery class keeps how often a user answered a question and
+    how often correctly, so adaptive quizzes can be weighted without reading
+    the quiz history.
+    Each row has four fields:
+
+    - **username**: Stores the username who answered the question.
+    - **qid**: Stores the question ID.
+    - **attempts**: Stores the number of times the question was answered.
+    - **correct**: Stores the number of correct answers.
+    - **last_quiz**: Stores the number of the last quiz of the user with
+      the question, counted by Users.quizzes_taken.
+
+    Rows are maintained by ReviewQuiz.save and can be rebuilt from the
+    quizzes table with the ``rebuild_statistics`` command. The questions a
+    user saw in their last N quizzes are the rows with
+    ``last_quiz > quizzes_taken - N``.
+    """
+    username = models.ForeignKey('Users', on_delete=models.CASCADE)
+    qid = models.ForeignKey('Questions', on_delete=models.CASCADE)
+    attempts = models.IntegerField(null=False, default=0)
+    correct = models.IntegerField(null=False, default=0)
+    last_quiz = models.IntegerField(null=False, default=0)
+
+    class Meta:
+        db_table = 'questionmastery'
+        unique_together = (("username", "qid"),)
+        indexes = [
+            models.Index(fields=['username', 'last_quiz']),
+        ]
+
+    @classmethod
+    def record(cls, quiz, learningoutcomes=None):
+        """
+        Adds the answers of a quiz to the totals of its user, per question
+        and per learning outcome, and marks its questions as seen in it.
+
+        **learningoutcomes** maps the keys of the questions of the quiz to
+        their learning outcomes; they are read from Questions when it is not
+        given. Questions missing from it are not counted.
+        """
+        answered = dict(quiz.answered())
+        if learningoutcomes is None:
+            learningoutcomes = dict(Questions.objects.filter(
+                pk__in=list(answered)).values_list('pk', 'learningoutcome'))
+        questions = [(qid, learningoutcomes[qid]) for qid in answered
+                     if qid in learningoutcomes]
+        outcomes = {}
+        for qid, learningoutcome in questions:
+            for outcome in set(learningoutcome):
+                attempts, correct = outcomes.get(outcome, (0, 0))
+                outcomes[outcome] = (attempts + 1,
+                                     correct + int(answered[qid]))
+        known = [qid for qid, learningoutcome in questions]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE {table} SET quizzes_taken = quizzes_taken + 1 '
+                'WHERE {key} = %s RETURNING quizzes_taken'.format(
+                    table=connection.ops.quote_name(Users._meta.db_table),
+                    key=connection.ops.quote_name(Users._meta.pk.column)),
+                [quiz.username_id])
+            row = cursor.fetchone()
+        number = row[0] if row is not None else None
+
+        cls.objects.bulk_create([
+            cls(username_id=quiz.username_id, qid_id=qid) for qid in known
+        ], ignore_conflicts=True)
+        rows = cls.objects.filter(username_id=quiz.username_id)
+        rows.filter(qid__in=[qid for qid in known if answered[qid]]).update(
+            attempts=F('attempts') + 1, correct=F('correct') + 1,
+            last_quiz=number)
+        rows.filter(qid__in=[qid for qid in known if not answered[qid]]).update(
+            attempts=F('attempts') + 1, last_quiz=number)
+
+        OutcomeMastery.objects.bulk_create([
+            OutcomeMastery(username_id=quiz.username_id,
+                           topic_id=quiz.topic_id, learningoutcome=outcome)
+            for outcome in outcomes
+        ], ignore_conflicts=True)
+        for outcome, (attempts, correct) in outcomes.items():
+            OutcomeMastery.objects.filter(
+                username_id=quiz.username_id, topic_id=quiz.topic_id,
+                learningoutcome=outcome).update(
+                attempts=F('attempts') + attempts,
+                correct=F('correct') + correct)
+
+
+class OutcomeMastery(models.Model):
+    """
+    The OutcomeMastery class keeps how often a user answered questions of a
+    learning outcome in a topic and how often correctly.
+    Each row has five fields:
+
+    - **username**: Stores the username who answered the questions.
+    - **topic**: Stores the topic of the quizzes.
+    - **learningoutcome**: Stores the learning outcome.
+    - **attempts**: Stores the number of answers for the outcome.
+    - **correct**: Stores the number of correct answers for the outcome.
+
+    Rows are maintained together with QuestionMastery.
+    """
+    username = models.ForeignKey('Users', on_delete=models.CASCADE)
+    topic = models.ForeignKey('Topics', on_delete=models.CASCADE)
+    learningoutcome = models.TextField(null=False)
+    attempts = models.IntegerField(null=False, default=0)
+    correct = models.IntegerField(null=False, default=0)
+
+    class Meta:
+        db_table = 'outcomemastery'
+        unique_together = (("username", "topic", "learningoutcome"),)
+
+
+# === Item Statistics Models ===
+
+
+class ItemStatistics(models.Model):
+    """
+    The ItemStatistics class keeps the classical item analysis of a
+    question, computed from the quizzes by the ``item_analysis`` command.
+    Each row has the question and:
+
+    - **attempts**: Stores the number of times the question was answered.
+    - **correct**: Stores the number of correct answers.
+    - **choices**: Stores, for each choice, how often it was selected.
+    - **scored**, **scored_correct**, **rest_sum**, **rest_squares** and
+      **rest_products**: Store, over the answers given in quizzes of more
+      than one question, their number, the correct ones, and the sums of the
+      rest score (the share of the other questions of the quiz answered
+      correctly), of its squares and of its products with the answer.
+    - **difficulty**: Stores the share of correct answers.
+    - **discrimination**: Stores the point-biserial correlation between
+      answering the question correctly and the rest score.
+
+    Only sums are stored, so new quizzes are added to a row without reading
+    the old ones; difficulty and discrimination are derived from them.
+    """
+    qid = models.OneToOneField('Questions', on_delete=models.CASCADE,
+                               primary_key=True)
+    attempts = models.IntegerField(null=False, default=0)
+    correct = models.IntegerField(null=False, default=0)
+    choices = ArrayField(models.IntegerField(), default=list)
+    scored = models.IntegerField(null=False, default=0)
+    scored_correct = models.IntegerField(null=False, default=0)
+    rest_sum = models.FloatField(null=False, default=0)
+    rest_squares = models.FloatField(null=False, default=0)
+    rest_products = models.FloatField(null=False, default=0)
+    difficulty = models.FloatField(null=True)
+    discrimination = models.FloatField(null=True)
+
+    class Meta:
+        db_table = 'itemstatistics'
+
+
+class BatchProgress(models.Model):
+    """
+    The BatchProgress class stores the last quiz batch (see
+    ReviewQuiz.close_batch) read by a batch job.
+    """
+    job = models.TextField(primary_key=True)
+    batch = models.IntegerField(null=False, default=0)
+
+    class Meta:
+        db_table = 'batchprogress'
 
 
 # === Question Tag Model ===
@@ -244,13 +778,18 @@ class QuestionLearningOutCome(models.Model):
 
     - qid: question id tag, foreign key
     - learningOutcome: learning outcome associated with question
-    - topic: topic assossciated with question
+
+    Rows are indexed on (learningoutcome, qid) so that the questions sharing
+    a set of outcomes can be found with one grouped query.
     """
     qid = models.ForeignKey(Questions, on_delete=models.PROTECT)
     learningoutcome = models.TextField()
 
     class Meta:
         db_table = 'questionlearningoutcome'
+        indexes = [
+            models.Index(fields=['learningoutcome', 'qid']),
+        ]
 
 # === Topic and Learning Outcome Model
 
@@ -276,6 +815,9 @@ class TopComment(models.Model):
     - **comment**: Stores the text comment of the comment.
     - **user**: Stores the username who created the comment.
     - **date**: Stores the creation data of the comment.
+
+    Comments are indexed on (parentid, date) so the discussion of a question
+    is read in date order without sorting.
     """
     parentid = models.ForeignKey('Questions', on_delete=models.CASCADE)
     commentid = models.TextField(primary_key=True)
@@ -285,6 +827,9 @@ class TopComment(models.Model):
 
     class Meta:
         db_table = 'topcomment'
+        indexes = [
+            models.Index(fields=['parentid', 'date']),
+        ]
 
 # === ChildComment Model ===
 
@@ -299,8 +844,12 @@ class ChildComment(models.Model):
     - **comment**: Stores the text comment of the child comment.
     - **user**: Stores the username who created the child comment.
     - **date**: Stores the creation data of the child comment.
+
+    Replies are indexed on (parentid, date) so the replies of a page of top
+    comments are fetched in date order with one query.
     """
-    parentid = models.ForeignKey('TopComment', on_delete=models.CASCADE)
+    parentid = models.ForeignKey(
+        'TopComment', on_delete=models.CASCADE, related_name='replies')
     id = models.TextField(primary_key=True)
     comment = models.TextField(null=True)
     user = models.ForeignKey('Users', on_delete=models.CASCADE)
@@ -308,6 +857,9 @@ class ChildComment(models.Model):
 
     class Meta:
         db_table = 'childcomment'
+        indexes = [
+            models.Index(fields=['parentid', 'date']),
+        ]
 
 # === QuestionRating Model ===
 
@@ -320,6 +872,10 @@ class QuestionRatings(models.Model):
     - **qid**: Stores the question ID associated with the rating.
     - **username**: Stores the username who created the rating.
     - **rating**: Stores an integer indicating the rating (0 - 5).
+
+    Saving or deleting a rating updates rating_sum and rating_count of the
+    question in the same transaction. Bulk queryset updates and deletes
+    bypass this and need ``rebuild_statistics`` to repair the totals.
     """
     qid = models.ForeignKey(Questions, on_delete=models.PROTECT)
     username = models.ForeignKey(Users, on_delete=models.PROTECT)
@@ -328,3 +884,36 @@ class QuestionRatings(models.Model):
     class Meta:
         db_table = 'questionratings'
         unique_together = (("qid", "username"),)
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the rating. A new rating is added to the totals of its question;
+        a changed rating replaces its old value in them.
+        """
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = QuestionRatings.objects.select_for_update().filter(
+                    pk=self.pk).values_list('qid', 'rating').first()
+            super().save(*args, **kwargs)
+            if previous is not None:
+                self._add_to_question(previous[0], -previous[1], -1)
+            self._add_to_question(self.qid_id, self.rating, 1)
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the rating and removes it from the totals of its question.
+        """
+        with transaction.atomic():
+            previous = QuestionRatings.objects.select_for_update().filter(
+                pk=self.pk).values_list('qid', 'rating').first()
+            result = super().delete(*args, **kwargs)
+            if previous is not None:
+                self._add_to_question(previous[0], -previous[1], -1)
+        return result
+
+    @staticmethod
+    def _add_to_question(qid, rating, count):
+        Questions.objects.filter(pk=qid).update(
+            rating_sum=F('rating_sum') + rating,
+            rating_count=F('rating_count') + count)
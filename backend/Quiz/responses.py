@@ -0,0 +1,191 @@
+"""
+Reads the quiz history as a sparse response matrix for the batch jobs.
+
+Every answer of a quiz is one entry of the matrix, with the quiz as row
+and the question key as column. Quizzes are read in chunks and each chunk
+is turned into flat NumPy arrays (coordinate format), so the jobs work on
+whole arrays instead of looping over quizzes in Python.
+"""
+
+import json
+import os
+from itertools import chain, islice
+
+import numpy as np
+
+
+class ResponseChunk():
+    """
+    The answers of a chunk of quizzes. Per quiz:
+
+    - **quizzes**: Quiz IDs.
+    - **users**: Usernames who took the quizzes.
+    - **lengths**: Number of questions.
+    - **scores**: Number of questions answered correctly.
+
+    Per answer, in quiz order:
+
+    - **quiz**: Index of the quiz in the lists above.
+    - **question**: Question key.
+    - **answer**: Bitmask of the selected choices, -1 when unknown.
+    - **correct**: True when answered correctly.
+
+    Answers to deleted questions are left out of the answer arrays but still
+    count in the lengths and scores of their quizzes. Quizzes whose arrays
+    have different lengths are left out.
+    """
+
+    def __init__(self, rows):
+        rows = [row for row in rows
+                if len(row[2]) == len(row[3]) == len(row[4])]
+        self.quizzes = [row[0] for row in rows]
+        self.users = [row[1] for row in rows]
+        self.lengths = np.fromiter((len(row[2]) for row in rows),
+                                   np.int64, len(rows))
+        size = int(self.lengths.sum())
+
+        quiz = np.repeat(np.arange(len(rows)), self.lengths)
+        question = np.fromiter(
+            (-1 if pk is None else pk
+             for pk in chain.from_iterable(row[2] for row in rows)),
+            np.int64, size)
+        answer = np.fromiter(
+            (-1 if mask is None else mask
+             for mask in chain.from_iterable(row[3] for row in rows)),
+            np.int16, size)
+        correct = np.fromiter(
+            chain.from_iterable(row[4] for row in rows), np.bool_, size)
+        self.scores = np.bincount(quiz, weights=correct,
+                                  minlength=len(rows)).astype(np.int64)
+
+        known = question >= 0
+        self.quiz = quiz[known]
+        self.question = question[known]
+        self.answer = answer[known]
+        self.correct = correct[known]
+
+    def __len__(self):
+        return len(self.quiz)
+
+
+def response_chunks(queryset, chunk_size=5000):
+    """
+    Yields a ResponseChunk for every **chunk_size** quizzes of a ReviewQuiz
+    queryset, read through a server-side cursor.
+    """
+    rows = queryset.values_list(
+        '_id', 'username', 'questions', 'answers', 'correctness'
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield ResponseChunk(chunk)
+
+
+class ResponseMatrix():
+    """
+    A response matrix kept on disk in coordinate form, one file per array,
+    so jobs can go over millions of answers with bounded memory:
+
+    - **users.int32**: Ordinal of the user who gave the answer.
+    - **questions.int32**: Ordinal of the question answered.
+    - **correct.uint8**: 1 when answered correctly.
+
+    Users and questions get ordinals in the order they first appear;
+    **users** lists the usernames and **questions** the question keys by
+    ordinal. save() writes both with the number of answers and the **info**
+    dictionary to matrix.json, and opening a directory that has one
+    continues the saved matrix. Answers appended after the last save are
+    dropped on opening.
+    """
+    arrays = {'users': np.int32, 'questions': np.int32, 'correct': np.uint8}
+    metadata = 'matrix.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.users = []
+        self.questions = []
+        self.size = 0
+        self.info = {}
+        if os.path.exists(os.path.join(directory, self.metadata)):
+            with open(os.path.join(directory, self.metadata)) as source:
+                saved = json.load(source)
+            self.users = saved.pop('users')
+            self.questions = saved.pop('questions')
+            self.size = saved.pop('size')
+            self.info = saved
+        for name, dtype in self.arrays.items():
+            if os.path.exists(self.path(name)):
+                os.truncate(self.path(name),
+                            self.size * np.dtype(dtype).itemsize)
+        self.user_ordinals = {username: ordinal
+                              for ordinal, username in enumerate(self.users)}
+        self.question_ordinals = {key: ordinal
+                                  for ordinal, key in enumerate(self.questions)}
+
+    def path(self, name):
+        return os.path.join(self.directory,
+                            '%s.%s' % (name, np.dtype(self.arrays[name]).name))
+
+    def clear(self):
+        """
+        Removes the files of the matrix and empties it.
+        """
+        for path in [self.path(name) for name in self.arrays] \
+                + [os.path.join(self.directory, self.metadata)]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.__init__(self.directory)
+
+    def append(self, chunk):
+        """
+        Appends the answers of a ResponseChunk to the files.
+        """
+        for username in chunk.users:
+            if username not in self.user_ordinals:
+                self.user_ordinals[username] = len(self.users)
+                self.users.append(username)
+        users = np.fromiter((self.user_ordinals[username]
+                             for username in chunk.users),
+                            np.int32, len(chunk.users))
+
+        keys, inverse = np.unique(chunk.question, return_inverse=True)
+        for key in keys.tolist():
+            if key not in self.question_ordinals:
+                self.question_ordinals[key] = len(self.questions)
+                self.questions.append(key)
+        questions = np.fromiter((self.question_ordinals[key]
+                                 for key in keys.tolist()),
+                                np.int32, len(keys))
+
+        values = {'users': users[chunk.quiz],
+                  'questions': questions[inverse],
+                  'correct': chunk.correct}
+        for name, dtype in self.arrays.items():
+            with open(self.path(name), 'ab') as output:
+                values[name].astype(dtype).tofile(output)
+        self.size += len(chunk)
+
+    def save(self):
+        """
+        Writes the lookup tables, size and info to matrix.json, replacing
+        the previous file at once.
+        """
+        for name in self.arrays:
+            # Empty matrices have no files yet
+            open(self.path(name), 'ab').close()
+        path = os.path.join(self.directory, self.metadata)
+        with open(path + '.tmp', 'w') as output:
+            json.dump(dict(self.info, size=self.size, users=self.users,
+                           questions=self.questions), output)
+        os.replace(path + '.tmp', path)
+
+    def load(self, name):
+        """
+        Returns one of the arrays, memory-mapped read-only.
+        """
+        if self.size == 0:
+            return np.zeros(0, self.arrays[name])
+        return np.memmap(self.path(name), dtype=self.arrays[name], mode='r',
+                         shape=(self.size,))
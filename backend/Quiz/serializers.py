@@ -1,9 +1,189 @@
 from .models import *
+from .helperClasses import questionIds
 from rest_framework import serializers
 from django.contrib.postgres.fields import ArrayField
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin():
+    """
+    Lets a GET request narrow the serialized fields with the comma separated
+    **fields** and **exclude** query parameters. Views use requested_fields
+    to load only those columns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request', None)
+        if request is not None:
+            keep = self.requested_fields(request)
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        fields = list(cls.Meta.fields)
+        if request.method != 'GET':
+            return fields
+        params = request.query_params
+        if 'fields' in params:
+            wanted = params['fields'].split(',')
+            fields = [name for name in fields if name in wanted]
+        if 'exclude' in params:
+            excluded = params['exclude'].split(',')
+            fields = [name for name in fields if name not in excluded]
+        return fields
+
+
+# Serializer fields that output a database value unchanged
+PLAIN_FIELDS = (serializers.CharField, serializers.BooleanField,
+                serializers.IntegerField, serializers.PrimaryKeyRelatedField)
+
+
+class ColumnField():
+    """
+    Marks a serializer field whose to_representation takes the column value
+    as loaded by ``.values()``, so values_plan can still use it. Before a
+    list is rendered, prepare is called with the values of the field in all
+    rows.
+    """
+
+    def prepare(self, values):
+        pass
+
+
+class ColumnListSerializer(serializers.ListSerializer):
+    """
+    Calls prepare on the ColumnFields of the child serializer with the
+    values of all instances before rendering them.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        data = list(data)
+        for field in self.child.fields.values():
+            if isinstance(field, ColumnField) and not field.write_only:
+                field.prepare([field.get_attribute(item) for item in data])
+        return super().to_representation(data)
+
+
+def values_plan(serializer):
+    """
+    Returns the (field name, column, field) triples to build the output of
+    the serializer straight from ``.values()`` rows, or None when one of its
+    fields has to go through the serializer. The field is None when the
+    column is output unchanged.
+    """
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        if isinstance(field, ColumnField):
+            plan.append((name, field.source, field))
+            continue
+        plain = field.child if isinstance(field, serializers.ListField) else field
+        if not isinstance(plain, PLAIN_FIELDS):
+            return None
+        plan.append((name, field.source, None))
+    return plan
+
+
+def render_values(plan, rows):
+    """
+    Builds the serializer output for ``.values()`` rows following a plan from
+    values_plan.
+    """
+    rows = list(rows)
+    for name, column, field in plan:
+        if field is not None:
+            field.prepare([row[column] for row in rows])
+    return [{name: row[column] if field is None
+             else field.to_representation(row[column])
+             for name, column, field in plan} for row in rows]
+
+
+class AnswersField(ColumnField, serializers.ListField):
+    """
+    Shows the answer bitmasks of ReviewQuiz as comma separated choice
+    indexes, e.g. "0,2". Answers are read back as text and turned into
+    bitmasks against the questions of the quiz (see
+    ReviewQuiz.resolve_answers).
+    """
+    child = serializers.CharField(allow_blank=True, allow_null=True)
+
+    def to_representation(self, data):
+        return [None if mask is None else
+                ','.join(str(i) for i in ReviewQuiz.decode_answer(mask))
+                for mask in data]
+
+
+class QuestionIdField(ColumnField, serializers.SlugRelatedField):
+    """
+    Shows a reference to a question by the question's public ID. The IDs
+    are read through the questionIds cache, one query for all rows.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('slug_field', '_id')
+        if not kwargs.get('read_only', False):
+            kwargs.setdefault('queryset', Questions.objects.all())
+        super().__init__(**kwargs)
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def prepare(self, values):
+        questionIds.get_many(set(getattr(value, 'pk', value)
+                                 for value in values) - {None})
+
+    def to_representation(self, value):
+        pk = getattr(value, 'pk', value)
+        return questionIds.get_many([pk]).get(pk, None)
+
+
+class QuestionIdListField(ColumnField, serializers.ListField):
+    """
+    Shows an array of question keys as question IDs, and reads question IDs
+    back into keys. Keys of deleted questions are shown as null.
+    """
+    child = serializers.CharField()
+
+    def prepare(self, values):
+        questionIds.get_many(set(pk for pks in values for pk in pks) - {None})
+
+    def to_representation(self, data):
+        ids = questionIds.get_many(set(data) - {None})
+        return [ids.get(pk, None) for pk in data]
+
+    def to_internal_value(self, data):
+        qids = super().to_internal_value(data)
+        keys = dict(Questions.objects.filter(
+            _id__in=qids).values_list('_id', 'pk'))
+        missing = [qid for qid in qids if qid not in keys]
+        if missing:
+            raise serializers.ValidationError(
+                'Unknown questions: %s' % ', '.join(missing))
+        return [keys[qid] for qid in qids]
+
+
+class CorrectnessField(ColumnField, serializers.ListField):
+    """
+    Shows the correctness bits of ReviewQuiz as "true" and "false".
+    """
+    child = serializers.CharField()
+
+    def to_representation(self, data):
+        return ['true' if correct else 'false' for correct in data]
+
+    def to_internal_value(self, data):
+        return [correct.lower() == 'true'
+                for correct in super().to_internal_value(data)]
+
+
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     #topcomment_listing = serializers.HyperlinkedIdentityField(view_name='topcomment-list')
     class Meta:
         model = Questions
@@ -13,6 +193,19 @@ class QuestionSerializer(serializers.ModelSerializer):
         lookup_field = '_id'
 
 
+class QuestionImportSerializer(QuestionSerializer):
+    """
+    Validates one question of a bulk import. The topic and username are kept
+    as plain names; the import view checks them against a lookup built once
+    per batch instead of querying for every question.
+    """
+    topic = serializers.CharField()
+    username = serializers.CharField()
+
+    class Meta(QuestionSerializer.Meta):
+        read_only_fields = ['_id']
+
+
 '''
 
 class QuestionTagSerializer(serializers.HyperlinkedModelSerializer):
@@ -33,19 +226,38 @@ class UsersSerializer(serializers.ModelSerializer):
 
 
 class ReviewQuizSerializer(serializers.ModelSerializer):
+    questions = QuestionIdListField()
+    answers = AnswersField()
+    correctness = CorrectnessField()
+
     class Meta:
         model = ReviewQuiz
+        list_serializer_class = ColumnListSerializer
         fields = ['_id', 'questions', 'answers', 'correct',
                   'total', 'username', 'topic', 'correctness']
 
+    def validate(self, attrs):
+        if 'answers' in attrs:
+            try:
+                attrs['answers'] = ReviewQuiz.resolve_answers(
+                    attrs.get('questions', []), attrs['answers'])
+            except ValueError:
+                raise serializers.ValidationError({'answers': [
+                    'Choice indexes must be between 0 and %d.'
+                    % (ReviewQuiz.MAX_CHOICES - 1)]})
+        return attrs
+
 
 class TopicsSerializer(serializers.ModelSerializer):
     learningoutcomes = serializers.ListField(child=serializers.CharField())
     tags = serializers.ListField(child=serializers.CharField())
+    # Annotated by the Topics listing only
+    questioncount = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Topics
-        fields = ['name', 'creator_id', 'tags', 'learningoutcomes']
+        fields = ['name', 'creator_id', 'tags', 'learningoutcomes',
+                  'questioncount']
 
 
 class TagsSerializer(serializers.ModelSerializer):
@@ -55,8 +267,12 @@ class TagsSerializer(serializers.ModelSerializer):
 
 
 class QuestionLearningOutComeSerializer(serializers.ModelSerializer):
+    qid = QuestionIdField()
+    topic = serializers.CharField(source='qid.topic_id', read_only=True)
+
     class Meta:
         model = QuestionLearningOutCome
+        list_serializer_class = ColumnListSerializer
         fields = ['qid', 'learningoutcome', 'topic']
 
 
@@ -73,12 +289,15 @@ class QuestionCommentSerializer(serializers.ModelSerializer):
         lookup_field = '_id'
 
 
-class TopCommentSerializer(serializers.ModelSerializer):
+class TopCommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     #parentid = QuestionCommentSerializer()
     #parentid = serializers.HyperlinkedRelatedField(queryset=Questions.objects.all(), view_name='question-detail', lookup_field='_id')
     #user = serializers.HyperlinkedRelatedField(view_name='users-detail',read_only=True, lookup_field='username')
+    parentid = QuestionIdField()
+
     class Meta:
         model = TopComment
+        list_serializer_class = ColumnListSerializer
         fields = ['parentid', 'commentid', 'comment', 'user', 'date']
         lookup_field = 'commentid'
 
@@ -91,7 +310,30 @@ class ChildCommentSerializer(serializers.ModelSerializer):
         fields = ['parentid', 'id', 'comment', 'user', 'date']
 
 
+class DiscussionSerializer(serializers.ModelSerializer):
+    # The question ID is joined in by DiscussionViewSet
+    parentid = serializers.CharField(source='question', read_only=True)
+    replies = ChildCommentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = TopComment
+        fields = ['parentid', 'commentid', 'comment', 'user', 'date', 'replies']
+
+
 class QuestionRatingsSerializer(serializers.ModelSerializer):
+    qid = QuestionIdField()
+
     class Meta:
         model = QuestionRatings
+        list_serializer_class = ColumnListSerializer
         fields = ['qid', 'username', 'rating']
+
+
+class ItemStatisticsSerializer(serializers.ModelSerializer):
+    qid = QuestionIdField(read_only=True)
+
+    class Meta:
+        model = ItemStatistics
+        list_serializer_class = ColumnListSerializer
+        fields = ['qid', 'attempts', 'correct', 'difficulty',
+                  'discrimination', 'choices']
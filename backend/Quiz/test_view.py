@@ -1,17 +1,39 @@
+import gzip
+import hashlib
 import json
+import uuid
+from io import StringIO
+from datetime import datetime, timedelta, timezone
 
 from rest_framework.test import RequestsClient
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from .models import *
 from .serializers import *
+from .helperClasses import (answerKeys, questionIds, statsByQuery,
+                            topicQuestions)
 
 
 # initialize the APIClient app
 client = Client()
 
 
+def question_keys(qids):
+    """
+    Returns the integer keys of questions, in the order of their IDs.
+    """
+    keys = dict(Questions.objects.filter(
+        _id__in=qids).values_list('_id', 'pk'))
+    return [keys[qid] for qid in qids]
+
+
 class GetUsersTest(TestCase):
     """
     This test case checks that we can correctly return the users
@@ -132,7 +154,8 @@ class GetAllTopicsTest(TestCase):
         # Get API Response
         response = client.get(reverse('get_post_topics'))
         # Get data from DB
-        topics = Topics.objects.all()
+        topics = Topics.objects.annotate(
+            questioncount=Count('questions')).order_by('name')
         serializer = TopicsSerializer(topics, many=True)
         self.assertEqual(response.data, serializer.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -931,7 +954,7 @@ class StatisticsQuizTest(TestCase):
 
         ReviewQuiz.objects.create(
             _id = 'abc',
-            questions = ['abcd', 'lmno'],
+            questions = [1, 2],
             answers = ['yes', 'no'],
             correct = 2,
             total = 2,
@@ -941,7 +964,7 @@ class StatisticsQuizTest(TestCase):
         )
         ReviewQuiz.objects.create(
             _id = 'abcd',
-            questions = ['abcd', 'lmno'],
+            questions = [1, 2],
             answers = ['yes', 'no'],
             correct = 2,
             total = 2,
@@ -951,7 +974,7 @@ class StatisticsQuizTest(TestCase):
         )
         ReviewQuiz.objects.create(
             _id = 'abcde',
-            questions = ['abcd', 'lmno'],
+            questions = [1, 2],
             answers = ['yes', 'no'],
             correct = 2,
             total = 2,
@@ -961,7 +984,7 @@ class StatisticsQuizTest(TestCase):
         )
         ReviewQuiz.objects.create(
             _id = 'abcdefg',
-            questions = ['abcd', 'lmno'],
+            questions = [1, 2],
             answers = ['yes', 'no'],
             correct = 2,
             total = 2,
@@ -1066,6 +1089,31 @@ class QuestionsForTopic(TestCase):
             self.assertEqual(data2[key], value )
             break
 
+    def test_counts_in_one_query(self):
+        question = Questions.objects.get(_id='someID2')
+        question.learningoutcome = ['LO 1', 'LO 2']
+        question.save()
+        question = Questions.objects.get(_id='someID4')
+        question.learningoutcome = []
+        question.save()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('get_question_stats'))
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data, {
+            'Topic A': {'Total': 3, 'LO 1': 3, 'LO 2': 1},
+            'Topic B': {'Total': 1}})
+
+    def test_topic_and_learning_outcome(self):
+        response = client.get(reverse('get_question_stats'),
+                              {'topic': 'Topic A'})
+        self.assertEqual(response.data, {'Topic A': {'total': 3, 'LO 1': 3}})
+        response = client.get(reverse('get_question_stats'),
+                              {'topic': 'Topic A', 'learningOutcome': 'LO 2'})
+        self.assertEqual(response.data, {'Topic A': {'total': 3}})
+        response = client.get(reverse('get_question_stats'),
+                              {'topic': 'Topic C'})
+        self.assertEqual(response.data, {'Topic C': {'total': 0}})
+
 
 
 class RatingsTest(TestCase):
@@ -1146,4 +1194,1739 @@ class RatingsTest(TestCase):
         key = response.data.keys()
         for i in key:
             self.assertEqual(i, 'someID1')
-        #self.assertEqual(val, 3.5)
\ No newline at end of file
+        #self.assertEqual(val, 3.5)
+
+
+class QuestionCursorPaginationTest(TestCase):
+    """
+    Test module to check that the Questions endpoint can page with a cursor
+    """
+    def setUp(self):
+        user1 = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i in range(3):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is a test question " + str(i) + ".",
+                shuffleoption=False,
+                choices=["A", "B", "C", "D"],
+                choiceanswers=[True, False, False, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user1,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B",
+                          "Feedback C", "Feedback D"],
+                hidden=False,
+                draft=False
+            )
+
+    def test_cursor_pages(self):
+        response = client.get(reverse('get_post_question'),
+                              {'pagination': 'cursor', 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual([q['_id'] for q in response.data['results']],
+                         ['someID0', 'someID1'])
+        self.assertIsNotNone(response.data['next'])
+
+        response = client.get(response.data['next'])
+        self.assertEqual([q['_id'] for q in response.data['results']],
+                         ['someID2'])
+        self.assertIsNone(response.data['next'])
+
+    def test_offset_pages(self):
+        response = client.get(reverse('get_post_question'), {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+
+
+class GenerateQuizSampleTest(TestCase):
+    """
+    Test module to check that GenerateQuiz samples questions in the database
+    """
+    def setUp(self):
+        user1 = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic1 = Topics.objects.create(
+            name="Topic A", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        topic2 = Topics.objects.create(
+            name="Topic B", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i in range(6):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is a test question " + str(i) + ".",
+                shuffleoption=False,
+                choices=["A", "B", "C", "D"],
+                choiceanswers=[True, False, False, False],
+                typename="multipleChoice",
+                topic=topic1 if i < 4 else topic2,
+                username=user1,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B",
+                          "Feedback C", "Feedback D"],
+                hidden=False,
+                draft=False
+            )
+
+    def test_sample_size(self):
+        # Only the chosen questions are read once the topic pool is cached
+        topicQuestions.get_many(['Topic A'])
+        with self.assertNumQueries(1):
+            response = client.get(reverse('get_questions'),
+                                  {'topic': 'Topic A', 'numQuestions': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [q['_id'] for q in response.data]
+        self.assertEqual(len(set(ids)), 3)
+        for q in response.data:
+            self.assertEqual(q['topic'], 'Topic A')
+
+    def test_pool_follows_writes(self):
+        topicQuestions.get_many(['Topic A'])
+        question = Questions.objects.get(_id='someID4')
+        question.topic_id = 'Topic A'
+        question.save()
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'numQuestions': 10})
+        self.assertEqual(len(response.data), 5)
+        Questions.objects.get(_id='someID0').delete()
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'numQuestions': 10})
+        self.assertEqual(len(response.data), 4)
+
+    def test_stale_pool(self):
+        # Writes from another process leave this process's pool stale
+        topicQuestions.get_many(['Topic A'])
+        Questions.objects.filter(_id='someID0').update(topic_id='Topic B')
+        Questions.objects.filter(_id='someID1').update(typename='text')
+        for seed in range(5):
+            response = client.get(reverse('get_questions'),
+                                  {'topic': 'Topic A', 'numQuestions': 2,
+                                   'seed': str(seed)})
+            self.assertEqual(sorted(q['_id'] for q in response.data),
+                             ['someID2', 'someID3'])
+
+    def test_sample_larger_than_topic(self):
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic B', 'numQuestions': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+
+class QuestionByLearningOutcomeTest(TestCase):
+    """
+    Test module to check that questions are matched on every learning outcome
+    """
+    def setUp(self):
+        user1 = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic1 = Topics.objects.create(
+            name="Topic A", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        topic2 = Topics.objects.create(
+            name="Topic B", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        outcomes = [["LO 1", "LO 2"], ["LO 1"], ["LO 2", "LO 1"]]
+        for i in range(3):
+            question = Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is a test question " + str(i) + ".",
+                shuffleoption=False,
+                choices=["A", "B", "C", "D"],
+                choiceanswers=[True, False, False, False],
+                typename="multipleChoice",
+                topic=topic1 if i < 2 else topic2,
+                username=user1,
+                learningoutcome=outcomes[i],
+                feedback=["Feedback A", "Feedback B",
+                          "Feedback C", "Feedback D"],
+                hidden=False,
+                draft=False
+            )
+            for item in outcomes[i]:
+                QuestionLearningOutCome.objects.create(
+                    qid=question, learningoutcome=item)
+
+    def test_intersection(self):
+        response = client.get(reverse('get_questions_by_loc'),
+                              {'learningoutcome': 'LO 1,LO 2'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(set(q['qid'] for q in response.data)),
+                         ['someID0', 'someID2'])
+        self.assertEqual(len(response.data), 4)
+
+    def test_intersection_for_topic(self):
+        response = client.get(reverse('get_questions_by_loc'),
+                              {'learningoutcome': 'LO 1,LO 2',
+                               'topic': 'Topic A'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(q['learningoutcome'] for q in response.data),
+                         ['LO 1', 'LO 2'])
+        for q in response.data:
+            self.assertEqual(q['qid'], 'someID0')
+            self.assertEqual(q['topic'], 'Topic A')
+
+
+class TopicStatisticsTest(TestCase):
+    """
+    Test module to check that quiz totals are kept per user and topic
+    """
+    def setUp(self):
+        user1 = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        user2 = Users.objects.create(
+            email='abartok@ualberta.ca', username='abartok',
+            password='blahblah', salt='salty')
+        topic1 = Topics.objects.create(
+            name="Topic A", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        topic2 = Topics.objects.create(
+            name="Topic B", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        quizzes = [(user1, topic1, 1, 2), (user1, topic1, 2, 3),
+                   (user2, topic1, 0, 2), (user1, topic2, 4, 4)]
+        for i, (user, topic, correct, total) in enumerate(quizzes):
+            ReviewQuiz.objects.create(
+                _id='quiz' + str(i),
+                questions=[1] * total,
+                answers=['yes'] * total,
+                correct=correct,
+                total=total,
+                username=user,
+                topic=topic,
+                correctness=[]
+            )
+
+    def test_totals_recorded_on_save(self):
+        stats = TopicStatistics.objects.get(username='tbartok', topic='Topic A')
+        self.assertEqual((stats.total, stats.correct, stats.attempts),
+                         (5, 3, 2))
+
+    def test_stats_endpoint(self):
+        response = client.get(reverse('get_quiz_stats'))
+        self.assertEqual(response.data, {
+            'Topic A': {'topic': 7, 'correct': 3},
+            'Topic B': {'topic': 4, 'correct': 4}})
+
+        response = client.get(reverse('get_quiz_stats'),
+                              {'username': 'tbartok', 'topic': 'Topic A'})
+        self.assertEqual(response.data, {
+            'Topic A': {'topic': 5, 'correct': 3}})
+
+    def test_stats_by_query(self):
+        self.assertEqual(
+            statsByQuery(ReviewQuiz.objects.filter(username='tbartok')).getTotal(),
+            statsByQuery(TopicStatistics.objects.filter(username='tbartok')).getTotal())
+
+    def test_rebuild(self):
+        TopicStatistics.objects.filter(topic='Topic B').delete()
+        TopicStatistics.objects.filter(topic='Topic A').update(total=0)
+        call_command('rebuild_statistics', stdout=StringIO())
+        response = client.get(reverse('get_quiz_stats'))
+        self.assertEqual(response.data, {
+            'Topic A': {'topic': 7, 'correct': 3},
+            'Topic B': {'topic': 4, 'correct': 4}})
+
+
+class QuestionRatingTotalsTest(TestCase):
+    """
+    Test module to check that rating totals are kept on the question
+    """
+    def setUp(self):
+        user1 = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        user2 = Users.objects.create(
+            email='abartok@ualberta.ca', username='abartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user1, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        question = Questions.objects.create(
+            _id="someID1",
+            prompt="This is a test question A.",
+            shuffleoption=False,
+            choices=["A", "B"],
+            choiceanswers=[True, False],
+            typename="multipleChoice",
+            topic=topic,
+            username=user1,
+            learningoutcome=["LO 1"],
+            feedback=["Feedback A", "Feedback B"],
+            hidden=False,
+            draft=False
+        )
+        QuestionRatings.objects.create(qid=question, username=user1, rating=4)
+        self.rating = QuestionRatings.objects.create(
+            qid=question, username=user2, rating=3)
+
+    def totals(self):
+        question = Questions.objects.get(_id="someID1")
+        return (question.rating_sum, question.rating_count)
+
+    def test_totals_on_create(self):
+        self.assertEqual(self.totals(), (7, 2))
+        response = client.get(reverse('question_ratings'), {'qid': 'someID1'})
+        self.assertEqual(response.data, {'qid': 'someID1', 'rating': 3.5,
+                                         'Number of ratings': 2})
+
+    def test_totals_on_update_and_delete(self):
+        self.rating.rating = 1
+        self.rating.save()
+        self.assertEqual(self.totals(), (5, 2))
+        self.rating.delete()
+        self.assertEqual(self.totals(), (4, 1))
+
+    def test_no_ratings(self):
+        response = client.get(reverse('question_ratings'), {'qid': 'missing'})
+        self.assertEqual(response.data, {'qid': 'missing', 'rating': None,
+                                         'Number of ratings': 0})
+
+    def test_rebuild(self):
+        Questions.objects.update(rating_sum=0, rating_count=0)
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.assertEqual(self.totals(), (7, 2))
+
+
+class UserMadeQuestionRatingsTest(TestCase):
+    """
+    Test module to check the ratings returned for the questions of authors
+    """
+    def setUp(self):
+        users = [Users.objects.create(
+            email=name + '@ualberta.ca', username=name,
+            password='blahblah', salt='salty')
+            for name in ['tbartok', 'abartok', 'kbartok']]
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=users[0], tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i, author in enumerate(users):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=author,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+        questions = Questions.objects.in_bulk(field_name='_id')
+        QuestionRatings.objects.create(
+            qid=questions["someID0"], username=users[1], rating=4)
+        QuestionRatings.objects.create(
+            qid=questions["someID0"], username=users[2], rating=3)
+        QuestionRatings.objects.create(
+            qid=questions["someID1"], username=users[0], rating=5)
+
+    def test_single_author(self):
+        with self.assertNumQueries(1):
+            response = client.get(reverse('get_ratings'),
+                                  {'username': 'tbartok'})
+        self.assertEqual(response.data, {'someID0': 3.5})
+
+    def test_single_question(self):
+        response = client.get(reverse('get_ratings'), {'qid': 'someID1'})
+        self.assertEqual(response.data, {'someID1': 5})
+
+    def test_batch(self):
+        with self.assertNumQueries(1):
+            response = client.get(reverse('get_ratings'),
+                                  {'usernames': 'tbartok,kbartok',
+                                   'qids': 'someID1'})
+        self.assertEqual(response.data, {
+            'someID0': {'username': 'tbartok', 'rating': 3.5,
+                        'Number of ratings': 2},
+            'someID1': {'username': 'abartok', 'rating': 5,
+                        'Number of ratings': 1}})
+
+    def test_missing_parameters(self):
+        response = client.get(reverse('get_ratings'))
+        self.assertEqual(response.data,
+                         "Error: you need to provide a qid or username")
+
+
+class DiscussionTest(TestCase):
+    """
+    Test module to check that a discussion is returned with nested replies
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        question = Questions.objects.create(
+            _id="someID1",
+            prompt="This is a test question A.",
+            shuffleoption=False,
+            choices=["A", "B"],
+            choiceanswers=[True, False],
+            typename="multipleChoice",
+            topic=topic,
+            username=user,
+            learningoutcome=["LO 1"],
+            feedback=["Feedback A", "Feedback B"],
+            hidden=False,
+            draft=False
+        )
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        for i in range(5):
+            top = TopComment.objects.create(
+                parentid=question, commentid='top' + str(i),
+                comment='Comment ' + str(i), user=user,
+                date=start + timedelta(hours=i))
+            for j in range(3):
+                ChildComment.objects.create(
+                    parentid=top, id='child' + str(i) + str(j),
+                    comment='Reply ' + str(j), user=user,
+                    date=start + timedelta(hours=i, minutes=10 - j))
+
+    def test_discussion_queries(self):
+        with self.assertNumQueries(2):
+            response = client.get(reverse('get_discussion'),
+                                  {'questionID': 'someID1', 'limit': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([c['commentid'] for c in results],
+                         ['top0', 'top1', 'top2', 'top3', 'top4'])
+        self.assertEqual([r['id'] for r in results[0]['replies']],
+                         ['child02', 'child01', 'child00'])
+
+    def test_discussion_pages(self):
+        response = client.get(reverse('get_discussion'),
+                              {'questionID': 'someID1', 'limit': 3})
+        self.assertEqual([c['commentid'] for c in response.data['results']],
+                         ['top0', 'top1', 'top2'])
+        response = client.get(response.data['next'])
+        self.assertEqual([c['commentid'] for c in response.data['results']],
+                         ['top3', 'top4'])
+
+
+class QuestionImportTest(TestCase):
+    """
+    Test module to check that a batch of questions is imported
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        existing = self.question("Existing question")
+        existing['_id'] = hashlib.sha224(
+            existing['prompt'].encode("utf-8")).hexdigest()
+        existing['topic_id'] = existing.pop('topic')
+        existing['username_id'] = existing.pop('username')
+        Questions.objects.create(**existing)
+
+    def question(self, prompt, **fields):
+        question = {
+            "prompt": prompt,
+            "shuffleoption": False,
+            "choices": ["A", "B"],
+            "choiceanswers": [True, False],
+            "typename": "multipleChoice",
+            "topic": "Topic A",
+            "username": "tbartok",
+            "learningoutcome": ["LO 1"],
+            "feedback": ["Feedback A", "Feedback B"],
+            "draft": False,
+            "hidden": False
+        }
+        question.update(fields)
+        return question
+
+    def test_import_json(self):
+        payload = [self.question("Question 1"),
+                   self.question("Existing question"),
+                   self.question("Question 2", topic="Missing"),
+                   self.question("Question 1"),
+                   self.question("Question 3")]
+        with self.assertNumQueries(7):
+            response = client.post(reverse('import_questions'),
+                                   data=json.dumps(payload),
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['created', 'duplicate', 'invalid', 'duplicate',
+                          'created'])
+        self.assertIn('topic', response.data['results'][2]['errors'])
+        self.assertEqual(Questions.objects.count(), 3)
+        self.assertEqual(QuestionCounts.objects.get(
+            topic='Topic A', learningoutcome='', draft=False,
+            hidden=False).count, 3)
+
+    def test_import_ndjson(self):
+        payload = '\n'.join(json.dumps(self.question("Question " + str(i)))
+                            for i in range(3))
+        response = client.post(reverse('import_questions'),
+                               data=payload + '\n',
+                               content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Questions.objects.count(), 4)
+
+    def test_import_invalid(self):
+        response = client.post(reverse('import_questions'),
+                               data=json.dumps([{"choices": ["A"]}]),
+                               content_type='application/json')
+        self.assertEqual(response.data['results'][0]['status'], 'invalid')
+        self.assertEqual(Questions.objects.count(), 1)
+
+
+class QuestionExportTest(TestCase):
+    """
+    Test module to check that the question bank is streamed as NDJSON
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        for name in ["Topic A", "Topic B"]:
+            Topics.objects.create(
+                name=name, creator_id=user, tags=["sample_tag"],
+                learningoutcomes=["LO 1", "LO 2"])
+        for i in range(4):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic_id="Topic A" if i % 2 == 0 else "Topic B",
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+
+    def test_export(self):
+        response = client.get(reverse('export_questions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        exported = [json.loads(line) for line in lines]
+        serializer = QuestionSerializer(
+            Questions.objects.order_by('_id'), many=True)
+        self.assertEqual(exported, json.loads(json.dumps(serializer.data)))
+
+    def test_export_topic_gzip(self):
+        response = client.get(reverse('export_questions'),
+                              {'topic': 'Topic B', 'gzip': 'true'})
+        content = gzip.decompress(b''.join(response.streaming_content))
+        exported = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([q['_id'] for q in exported], ['someID1', 'someID3'])
+
+
+class ConditionalRequestTest(TestCase):
+    """
+    Test module to check ETags on the question and topic detail endpoints
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='kbartok@ualberta.ca', username='kbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name='Containerization', creator_id=user,
+            learningoutcomes=["LO 1"], tags=["some"])
+        Questions.objects.create(
+            _id="someID1",
+            prompt="This is a test question A.",
+            shuffleoption=False,
+            choices=["A", "B"],
+            choiceanswers=[True, False],
+            typename="multipleChoice",
+            topic=topic,
+            username=user,
+            learningoutcome=["LO 1"],
+            feedback=["Feedback A", "Feedback B"],
+            draft=False,
+            hidden=False
+        )
+        self.url = reverse('get_delete_update_questions',
+                           kwargs={'_id': 'someID1'})
+        self.payload = {
+            "_id": "someID1",
+            "prompt": "This is a test question AAAA.",
+            "shuffleoption": False,
+            "choices": ["A", "B"],
+            "choiceanswers": [True, False],
+            "typename": "multipleChoice",
+            "topic": 'Containerization',
+            "username": 'kbartok',
+            "learningoutcome": ["LO 1"],
+            'hidden': False,
+            'draft': False
+        }
+
+    def test_not_modified(self):
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # A rating does not change the serialized question
+        QuestionRatings.objects.create(
+            qid=Questions.objects.get(_id="someID1"), username_id='kbartok',
+            rating=4)
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_match(self):
+        etag = client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = client.put(self.url, data=json.dumps(self.payload),
+                                  content_type='application/json',
+                                  HTTP_IF_MATCH=etag)
+        # The question is read once, locked, and not again for the ETag
+        reads = [query for query in queries.captured_queries
+                 if query['sql'].startswith('SELECT "questions"."id"')]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response['ETag'], client.get(self.url)['ETag'])
+
+        response = client.put(self.url, data=json.dumps(self.payload),
+                              content_type='application/json',
+                              HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        response = client.delete(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(Questions.objects.filter(_id="someID1").exists())
+
+    def test_topic_etag(self):
+        url = reverse('get_delete_update_topics',
+                      kwargs={'name': 'Containerization'})
+        etag = client.get(url)['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SparseFieldsTest(TestCase):
+    """
+    Test module to check that question lists can be narrowed to some fields
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i in range(3):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+
+    def test_fields(self):
+        response = client.get(reverse('get_post_question'),
+                              {'fields': '_id,prompt'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        for question in response.data:
+            self.assertEqual(set(question), {'_id', 'prompt'})
+
+    def test_exclude(self):
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'numQuestions': 2,
+                               'exclude': 'choices,choiceanswers,feedback'})
+        self.assertEqual(len(response.data), 2)
+        for question in response.data:
+            self.assertNotIn('choices', question)
+            self.assertIn('prompt', question)
+
+    def test_projection(self):
+        with CaptureQueriesContext(connection) as queries:
+            client.get(reverse('question-detail'),
+                       {'qID': 'someID1', 'fields': '_id,prompt'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"prompt"', sql)
+        self.assertNotIn('"choices"', sql)
+
+
+class ValuesListTest(TestCase):
+    """
+    Test module to check that lists built from values() rows render the
+    same bytes as the serializers
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i in range(3):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=i == 1,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=None if i == 2 else ["Feedback A", None],
+                hidden=False,
+                draft=False
+            )
+            ReviewQuiz.objects.create(
+                _id='quiz' + str(i), questions=question_keys(['someID' + str(i)]),
+                answers=['A'], correct=1, total=1, username=user,
+                topic=topic, correctness=[True])
+
+    def assertRendersLike(self, response, serializer):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content,
+                         JSONRenderer().render(serializer.data))
+
+    def test_questions(self):
+        response = client.get(reverse('get_post_question'))
+        self.assertRendersLike(response, QuestionSerializer(
+            Questions.objects.all(), many=True))
+
+    def test_questions_fields(self):
+        response = client.get(reverse('get_post_question'),
+                              {'pagination': 'cursor', 'fields': 'prompt'})
+        results = response.data['results']
+        self.assertEqual(results, [{'prompt': 'This is test question ' + str(i)}
+                                   for i in range(3)])
+
+    def test_quizzes(self):
+        response = client.get(reverse('get_post_quiz'))
+        self.assertRendersLike(response, ReviewQuizSerializer(
+            ReviewQuiz.objects.all(), many=True))
+
+    def test_topics(self):
+        response = client.get(reverse('get_post_topics'))
+        self.assertRendersLike(response, TopicsSerializer(
+            Topics.objects.annotate(questioncount=Count('questions')),
+            many=True))
+
+    def test_benchmark_lists(self):
+        out = StringIO()
+        call_command('benchmark_lists', rows=20, repeat=1, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[:2] for line in lines],
+                         [['Questions', '23'], ['ReviewQuiz', '23'],
+                          ['Topics', '21']])
+        # The rows it created are rolled back
+        self.assertEqual(Questions.objects.count(), 3)
+
+
+class StratifiedQuizTest(TestCase):
+    """
+    Test module to check that quizzes can be drawn per learning outcome
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2", "LO 3"])
+        outcomes = [["LO 1"]] * 6 + [["LO 2"]] * 2 + [["LO 1", "LO 2"]]
+        for i, learningoutcome in enumerate(outcomes):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=learningoutcome,
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+
+    def test_quotas(self):
+        with self.assertNumQueries(2):
+            response = client.get(reverse('get_questions'),
+                                  {'topic': 'Topic A',
+                                   'quotas': 'LO 1:2,LO 2:3'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        ids = [q['_id'] for q in results]
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+        self.assertEqual(
+            sum('LO 2' in q['learningoutcome'] for q in results), 3)
+        self.assertEqual(response.data['unmet'], {})
+
+    def test_unmet_quota(self):
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'quotas': 'LO 2:5,LO 3:1'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['unmet'], {'LO 2': 2, 'LO 3': 1})
+
+    def test_balanced(self):
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'balanced': 'true',
+                               'numQuestions': 4})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['unmet'], {'LO 3': 1})
+
+    def test_invalid_quotas(self):
+        response = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'quotas': 'LO 1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdaptiveQuizTest(TestCase):
+    """
+    Test module to check mastery tracking and adaptive quizzes
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        self.topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i in range(10):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=self.topic,
+                username=user,
+                learningoutcome=["LO 1"] if i < 5 else ["LO 2"],
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+        # LO 1 is always answered correctly, LO 2 always wrong
+        for n in range(20):
+            ReviewQuiz.objects.create(
+                _id='quiz' + str(n),
+                questions=question_keys(['someID' + str(i) for i in range(10)]),
+                answers=['A'] * 10,
+                correct=5,
+                total=10,
+                username=user,
+                topic=self.topic,
+                correctness=[True] * 5 + [False] * 5
+            )
+
+    def test_mastery_recorded(self):
+        mastery = QuestionMastery.objects.get(username='tbartok',
+                                              qid___id='someID0')
+        self.assertEqual((mastery.attempts, mastery.correct), (20, 20))
+        outcome = OutcomeMastery.objects.get(
+            username='tbartok', topic='Topic A', learningoutcome='LO 2')
+        self.assertEqual((outcome.attempts, outcome.correct), (100, 0))
+
+    def test_adaptive_favours_weak_questions(self):
+        weak = 0
+        for i in range(20):
+            with self.assertNumQueries(1):
+                response = client.get(reverse('get_questions'),
+                                      {'topic': 'Topic A', 'numQuestions': 2,
+                                       'adaptive': 'true',
+                                       'username': 'tbartok'})
+            weak += sum(q['learningoutcome'] == ['LO 2']
+                        for q in response.data)
+        # The weights make LO 2 questions over 30 times more likely
+        self.assertGreater(weak, 30)
+
+    def test_unseen_outcome(self):
+        from .views import QuestionIDByTopic
+
+        question = Questions.objects.get(_id='someID0')
+        for i, outcomes in [(10, ["LO 1", "LO 3"]), (11, ["LO 1"])]:
+            question.pk = None
+            question._id = 'someID' + str(i)
+            question.learningoutcome = outcomes
+            question.save()
+        weights = dict(Questions.objects.annotate(
+            weight=QuestionIDByTopic().weakness('Topic A', 'tbartok')
+        ).values_list('_id', 'weight'))
+        # Unseen question; LO 1 is mastered but LO 3 was never answered
+        self.assertAlmostEqual(weights['someID10'], 0.5 + 0.5)
+        self.assertAlmostEqual(weights['someID11'], 0.5 + 1 / 102)
+        self.assertAlmostEqual(weights['someID0'], 1 / 22 + 1 / 102)
+
+    def test_rebuild(self):
+        QuestionMastery.objects.all().delete()
+        OutcomeMastery.objects.all().update(attempts=0)
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.test_mastery_recorded()
+
+
+class ExcludeSeenTest(TestCase):
+    """
+    Test module to check that recently seen questions can be left out
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1"])
+        for i in range(6):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+        # Quiz n shows questions n and n + 1
+        for n in range(3):
+            ReviewQuiz.objects.create(
+                _id='quiz' + str(n),
+                questions=question_keys(['someID' + str(n),
+                                         'someID' + str(n + 1)]),
+                answers=['A', 'A'],
+                correct=1,
+                total=2,
+                username=user,
+                topic=topic,
+                correctness=[True, False]
+            )
+
+    def generate(self, excludeSeen):
+        topicQuestions.get_many(['Topic A'])
+        # The seen questions, then the chosen ones
+        with self.assertNumQueries(2):
+            response = client.get(reverse('get_questions'),
+                                  {'topic': 'Topic A', 'numQuestions': 10,
+                                   'username': 'tbartok',
+                                   'excludeSeen': excludeSeen})
+        return sorted(q['_id'] for q in response.data)
+
+    def test_exclude_seen(self):
+        self.assertEqual(self.generate(1),
+                         ['someID0', 'someID1', 'someID4', 'someID5'])
+        self.assertEqual(self.generate(2), ['someID0', 'someID4', 'someID5'])
+        self.assertEqual(self.generate(3), ['someID4', 'someID5'])
+        self.assertEqual(len(self.generate(0)), 6)
+
+    def test_rebuild(self):
+        recorded = set(QuestionMastery.objects.values_list(
+            'qid', 'last_quiz'))
+        QuestionMastery.objects.all().delete()
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.assertEqual(Users.objects.get(username='tbartok').quizzes_taken, 3)
+        self.assertEqual(set(QuestionMastery.objects.values_list(
+            'qid', 'last_quiz')), recorded)
+        self.assertEqual(len(self.generate(3)), 2)
+
+    def test_rebuild_uuid_ids(self):
+        # GradeQuiz names quizzes with random UUIDs, which do not sort in
+        # the order the quizzes were taken
+        ids = sorted((uuid.uuid4().hex for n in range(3)), reverse=True)
+        for n, _id in enumerate(ids):
+            ReviewQuiz.objects.create(
+                _id=_id,
+                questions=question_keys(['someID' + str(n + 3),
+                                         'someID' + str((n + 4) % 6)]),
+                answers=['A', 'A'], correct=1, total=2,
+                username_id='tbartok', topic_id='Topic A',
+                correctness=[True, False])
+        recorded = set(QuestionMastery.objects.values_list(
+            'qid', 'last_quiz'))
+        call_command('rebuild_statistics', stdout=StringIO())
+        self.assertEqual(set(QuestionMastery.objects.values_list(
+            'qid', 'last_quiz')), recorded)
+
+
+class QuizBatchTest(TestCase):
+    """
+    Test module to check that quizzes are generated and staged in batches
+    """
+    def setUp(self):
+        for name in ['tbartok', 'abartok']:
+            user = Users.objects.create(
+                email=name + '@ualberta.ca', username=name,
+                password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1"])
+        for i in range(8):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B"],
+                hidden=False,
+                draft=False
+            )
+
+    def test_batch(self):
+        with self.assertNumQueries(2):
+            response = client.post(
+                reverse('generate_quiz_batch'),
+                data=json.dumps({'topic': 'Topic A', 'numQuestions': 3,
+                                 'count': 30}),
+                content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quizzes = response.data['quizzes']
+        self.assertEqual(len(quizzes), 30)
+        for quiz in quizzes:
+            self.assertEqual(len(set(q['_id'] for q in quiz)), 3)
+
+    def test_stage_for_roster(self):
+        response = client.post(
+            reverse('generate_quiz_batch'),
+            data=json.dumps({'topic': 'Topic A', 'numQuestions': 3,
+                             'roster': ['tbartok', 'abartok']}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        staged = response.data['quizzes']
+        self.assertEqual([quiz['username'] for quiz in staged],
+                         ['tbartok', 'abartok'])
+
+        response = client.get(reverse('get_staged_quiz',
+                                      kwargs={'_id': staged[0]['_id']}))
+        self.assertEqual(response.data['username'], 'tbartok')
+        quiz = StagedQuiz.objects.get(_id=staged[0]['_id'])
+        ids = dict(Questions.objects.values_list('pk', '_id'))
+        self.assertEqual([q['_id'] for q in response.data['questions']],
+                         [ids[pk] for pk in quiz.questions])
+
+    def test_unknown_user(self):
+        response = client.post(
+            reverse('generate_quiz_batch'),
+            data=json.dumps({'topic': 'Topic A', 'numQuestions': 3,
+                             'roster': ['tbartok', 'nobody']}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StagedQuiz.objects.exists())
+
+    def test_invalid_parameters(self):
+        for data in [{'numQuestions': -1, 'count': 2},
+                     {'numQuestions': 3, 'count': 0},
+                     {'numQuestions': 3, 'count': 1001},
+                     {'numQuestions': 3, 'roster': 'tbartok'},
+                     {'numQuestions': 3, 'roster': []},
+                     {'numQuestions': 3, 'roster': [['tbartok']]}]:
+            data['topic'] = 'Topic A'
+            response = client.post(reverse('generate_quiz_batch'),
+                                   data=json.dumps(data),
+                                   content_type='application/json')
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST, data)
+        self.assertFalse(StagedQuiz.objects.exists())
+
+
+class SeededQuizTest(TestCase):
+    """
+    Test module to check that seeded quizzes are reproducible
+    """
+    def setUp(self):
+        cache.clear()
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1", "LO 2"])
+        for i in range(20):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=True,
+                choices=["A", "B", "C", "D", "E", "F"],
+                choiceanswers=[True, False, False, False, False, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"] if i % 2 else ["LO 2"],
+                feedback=["Right", "Wrong", "Wrong", "Wrong", "Wrong", "Wrong"],
+                hidden=False,
+                draft=False
+            )
+
+    def generate(self, **params):
+        params.update({'topic': 'Topic A', 'numQuestions': 5})
+        return client.get(reverse('get_questions'), params)
+
+    def test_same_seed(self):
+        first = self.generate(seed='abc')
+        cache.clear()
+        second = self.generate(seed='abc')
+        self.assertEqual(first['Quiz-Seed'], 'abc')
+        self.assertEqual(first.data, second.data)
+        self.assertNotEqual(first.data, self.generate(seed='xyz').data)
+
+    def test_choices_shuffled_together(self):
+        response = self.generate(seed='abc')
+        orders = set()
+        for question in response.data:
+            answer = question['choiceanswers'].index(True)
+            self.assertEqual(question['choices'][answer], 'A')
+            self.assertEqual(question['feedback'][answer], 'Right')
+            orders.add(tuple(question['choices']))
+        self.assertGreater(len(orders), 1)
+
+    def test_new_seed(self):
+        response = self.generate(seed='new')
+        seed = response['Quiz-Seed']
+        self.assertEqual(self.generate(seed=seed).data, response.data)
+
+    def test_cached(self):
+        self.generate(seed='abc')
+        with self.assertNumQueries(0):
+            self.generate(seed='abc')
+
+    def test_seeded_quotas(self):
+        params = {'quotas': 'LO 1:2,LO 2:2', 'seed': 'abc'}
+        first = self.generate(**params)
+        cache.clear()
+        self.assertEqual(first.data, self.generate(**params).data)
+
+
+class GradeQuizTest(TestCase):
+    """
+    Test module to check that quizzes are graded on the server
+    """
+    def setUp(self):
+        answerKeys.clear()
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1"])
+        for i, choiceanswers in enumerate([[True, False, False],
+                                           [False, True, True]]):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B", "C"],
+                choiceanswers=choiceanswers,
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=["Feedback A", "Feedback B", "Feedback C"],
+                hidden=False,
+                draft=False
+            )
+
+    def grade(self, answers, **fields):
+        payload = {'username': 'tbartok', 'topic': 'Topic A',
+                   'questions': ['someID0', 'someID1'], 'answers': answers}
+        payload.update(fields)
+        return client.post(reverse('grade_quiz'), data=json.dumps(payload),
+                           content_type='application/json')
+
+    def test_grade(self):
+        response = self.grade([0, [1]], _id='quiz1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['correct'], 1)
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(response.data['correctness'], ['true', 'false'])
+        quiz = ReviewQuiz.objects.get(_id='quiz1')
+        self.assertEqual(quiz.questions, question_keys(['someID0', 'someID1']))
+        self.assertEqual(quiz.answers, [1, 2])
+        self.assertEqual(TopicStatistics.objects.get(
+            username='tbartok', topic='Topic A').correct, 1)
+
+        response = self.grade([[0], [2, 1]])
+        self.assertEqual(response.data['correct'], 2)
+
+    def test_queries(self):
+        questionIds.clear()
+        # The answer keys, then only writes: the quiz and its totals in
+        # two savepoints, and the deferred constraint check
+        with self.assertNumQueries(14):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.grade([0, [1, 2]], _id='quiz1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['questions'], ['someID0', 'someID1'])
+        reads = [query['sql'] for query in queries.captured_queries
+                 if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(reads), 1)
+        self.assertIn('"questions"', reads[0])
+
+        # With the answer keys cached nothing is read
+        with CaptureQueriesContext(connection) as queries:
+            self.grade([0, [1, 2]], _id='quiz2')
+        self.assertFalse([query for query in queries.captured_queries
+                          if query['sql'].startswith('SELECT')])
+        self.assertEqual(QuestionMastery.objects.get(
+            qid__in=question_keys(['someID0'])).attempts, 2)
+        self.assertEqual(OutcomeMastery.objects.get().attempts, 4)
+        self.assertEqual(TopicStatistics.objects.get().attempts, 2)
+
+    def test_answer_key_cache(self):
+        answerKeys.get_many(['someID0', 'someID1'])
+        with self.assertNumQueries(0):
+            keys = answerKeys.get_many(['someID0', 'someID1'])
+        pks = question_keys(['someID0', 'someID1'])
+        self.assertEqual(keys, {'someID0': (1, 3, pks[0], False, ['LO 1']),
+                                'someID1': (6, 3, pks[1], False, ['LO 1'])})
+
+        question = Questions.objects.get(_id='someID0')
+        question.choiceanswers = [False, False, True]
+        question.save()
+        self.assertEqual(answerKeys.get_many(['someID0']),
+                         {'someID0': (4, 3, pks[0], False, ['LO 1'])})
+
+    def test_seeded_shuffle(self):
+        Questions.objects.filter(_id__in=['someID0', 'someID1']).update(
+            shuffleoption=True)
+        answerKeys.clear()
+        # Find a seed that moves the correct choice of the first question
+        for n in range(100):
+            quiz = client.get(reverse('get_questions'),
+                              {'topic': 'Topic A', 'numQuestions': 2,
+                               'seed': 'seed' + str(n)})
+            shown = {q['_id']: q for q in quiz.data}
+            if shown['someID0']['choiceanswers'][0] is False:
+                break
+        seed = quiz['Quiz-Seed']
+        answers = [[i for i, correct in
+                    enumerate(shown[qid]['choiceanswers']) if correct]
+                   for qid in ['someID0', 'someID1']]
+
+        response = self.grade(answers, seed=seed, _id='quiz1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['correct'], 2)
+        # Stored with the unshuffled indexes
+        self.assertEqual(ReviewQuiz.objects.get(_id='quiz1').answers, [1, 6])
+        # The shown indexes are wrong against the unshuffled choices
+        self.assertLess(self.grade(answers).data['correct'], 2)
+
+    def test_invalid(self):
+        self.assertEqual(self.grade([True, [0]]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.grade([[False], [0]]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.grade([0]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.grade([0, [5]]).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.grade([0, 1], topic='Missing').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        for questions in [[0, 1], [['someID0'], 'someID1'],
+                          [{'_id': 'someID0'}, None], 'someID0']:
+            self.assertEqual(self.grade([0, 1], questions=questions)
+                             .status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.grade({'0': 0, '1': 1}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ReviewQuiz.objects.exists())
+
+
+class CompactQuizTest(TestCase):
+    """
+    Test module to check that quizzes are stored compactly and still shown
+    as strings
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1"])
+        for i in range(1, 4):
+            Questions.objects.create(
+                _id="q" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["3", "4", "5"] if i == 3 else ["A", "B", "C"],
+                choiceanswers=[True, False, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=None,
+                hidden=False,
+                draft=False
+            )
+
+    def test_round_trip(self):
+        payload = {'_id': 'quiz1', 'questions': ['q1', 'q2', 'q3'],
+                   'answers': ['0,2', '', '1'], 'correct': 1, 'total': 3,
+                   'username': 'tbartok', 'topic': 'Topic A',
+                   'correctness': ['true', 'false', 'False']}
+        response = client.post(reverse('get_post_quiz'),
+                               data=json.dumps(payload),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        quiz = ReviewQuiz.objects.get(_id='quiz1')
+        self.assertEqual(quiz.questions, question_keys(['q1', 'q2', 'q3']))
+        self.assertEqual(quiz.answers, [5, 0, 2])
+        self.assertEqual(quiz.correctness, [True, False, False])
+
+        response = client.get(reverse('get_post_quiz'), {'_id': 'quiz1'})
+        self.assertEqual(response.data[0]['questions'], ['q1', 'q2', 'q3'])
+        self.assertEqual(response.data[0]['answers'],
+                         ['0,2', '', '1'])
+        self.assertEqual(response.data[0]['correctness'],
+                         ['true', 'false', 'false'])
+
+    def test_choice_text(self):
+        payload = {'_id': 'quiz1', 'questions': ['q1', 'q2', 'q3'],
+                   'answers': ['C', 'A', '5'], 'correct': 1, 'total': 3,
+                   'username': 'tbartok', 'topic': 'Topic A',
+                   'correctness': ['false', 'true', 'false']}
+        response = client.post(reverse('get_post_quiz'),
+                               data=json.dumps(payload),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Choice text is matched before indexes, even when it is a number
+        self.assertEqual(ReviewQuiz.objects.get(_id='quiz1').answers,
+                         [4, 1, 4])
+
+        ReviewQuiz.objects.create(
+            _id='quiz2', questions=question_keys(['q1', 'q2', 'q3']),
+            answers=['yes', 2, '4'], correct=1, total=3,
+            username_id='tbartok', topic_id='Topic A',
+            correctness=[True, False, False])
+        self.assertEqual(ReviewQuiz.objects.get(_id='quiz2').answers,
+                         [None, 2, 2])
+
+    def test_invalid_answer(self):
+        payload = {'_id': 'quiz1', 'questions': ['q1'], 'answers': ['0,20'],
+                   'correct': 0, 'total': 1, 'username': 'tbartok',
+                   'topic': 'Topic A', 'correctness': ['false']}
+        response = client.post(reverse('get_post_quiz'),
+                               data=json.dumps(payload),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        payload.update(questions=['missing'], answers=['0'])
+        response = client.post(reverse('get_post_quiz'),
+                               data=json.dumps(payload),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_question_ids(self):
+        pks = question_keys(['q1', 'q2', 'q3'])
+        for i in range(5):
+            ReviewQuiz.objects.create(
+                _id='quiz' + str(i), questions=pks, answers=[1, 1, 1],
+                correct=3, total=3, username_id='tbartok',
+                topic_id='Topic A', correctness=[True, True, True])
+        questionIds.clear()
+        # The count, the quizzes and one query for the IDs of their questions
+        with self.assertNumQueries(3):
+            response = client.get(reverse('get_post_quiz'))
+        for quiz in response.data:
+            self.assertEqual(quiz['questions'], ['q1', 'q2', 'q3'])
+
+        Questions.objects.get(_id='q2').delete()
+        response = client.get(reverse('get_post_quiz'), {'_id': 'quiz0'})
+        self.assertEqual(response.data[0]['questions'], ['q1', None, 'q3'])
+
+    def test_compact_quizzes(self):
+        pks = question_keys(['q1', 'q2', 'q3'])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "ALTER TABLE quizzes DROP COLUMN answers, "
+                "DROP COLUMN correctness, ADD COLUMN answers text[], "
+                "ADD COLUMN correctness text[]")
+            insert = ("INSERT INTO quizzes (_id, questions, answers, "
+                      "correct, total, username_id, topic_id, correctness) "
+                      "VALUES (%s, %s, %s, 1, 3, 'tbartok', 'Topic A', %s)")
+            cursor.execute(insert, ['quiz1', pks, ['0,2', '', '4'],
+                                    ['TRUE', 'false', 'true']])
+            cursor.execute(insert, ['quiz2', pks[:2], ['yes', 'B'],
+                                    ['false', 'false']])
+            # Run the deferred foreign key checks before altering the table
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        call_command('compact_quizzes', stdout=StringIO())
+        quiz = ReviewQuiz.objects.get(_id='quiz1')
+        self.assertEqual(quiz.answers, [5, 0, 2])
+        self.assertEqual(quiz.correctness, [True, False, True])
+        self.assertEqual(ReviewQuizSerializer(quiz).data['answers'],
+                         ['0,2', '', '1'])
+        # Text that is not a choice of the question has no index
+        self.assertEqual(ReviewQuiz.objects.get(_id='quiz2').answers,
+                         [None, 2])
+
+
+class ItemAnalysisTest(TestCase):
+    """
+    Test module to check the item analysis computed from the quizzes
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1"])
+        for i in range(3):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B", "C"],
+                choiceanswers=[True, False, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=None,
+                hidden=False,
+                draft=False
+            )
+        self.pks = question_keys(['someID0', 'someID1', 'someID2'])
+        quizzes = [([True, True, False], [1, 1, 2]),
+                   ([True, False, False], [1, 2, 4]),
+                   ([False, False, False], [2, 4, 4]),
+                   ([True, True], [1, 1])]
+        for i, (correctness, answers) in enumerate(quizzes):
+            self.take('quiz' + str(i), correctness, answers)
+
+    def take(self, _id, correctness, answers):
+        ReviewQuiz.objects.create(
+            _id=_id, questions=self.pks[:len(correctness)], answers=answers,
+            correct=sum(correctness), total=len(correctness),
+            username_id='tbartok', topic_id='Topic A',
+            correctness=correctness)
+
+    def analyse(self, *args):
+        call_command('item_analysis', *args, stdout=StringIO())
+        return {item.qid_id: item for item in ItemStatistics.objects.all()}
+
+    def test_statistics(self):
+        import numpy as np
+
+        items = self.analyse()
+        item = items[self.pks[0]]
+        self.assertEqual((item.attempts, item.correct), (4, 3))
+        self.assertEqual(item.difficulty, 0.75)
+        self.assertEqual(item.choices, [3, 1, 0])
+        # Rest scores of the four quizzes for the first question
+        expected = np.corrcoef([1, 1, 0, 1], [0.5, 0, 0, 1])[0, 1]
+        self.assertAlmostEqual(item.discrimination, expected)
+        self.assertEqual(items[self.pks[2]].choices, [0, 1, 2])
+        # Nobody answered the last question correctly
+        self.assertIsNone(items[self.pks[2]].discrimination)
+
+    def test_incremental(self):
+        self.analyse()
+        self.take('quiz4', [False, True, True], [2, 1, 1])
+        self.take('quiz5', [True, False, True], [1, 4, 1])
+        items = self.analyse()
+        rebuilt = self.analyse('--rebuild')
+        for pk in self.pks:
+            self.assertEqual(items[pk].attempts, rebuilt[pk].attempts)
+            self.assertEqual(items[pk].choices, rebuilt[pk].choices)
+            self.assertAlmostEqual(items[pk].discrimination,
+                                   rebuilt[pk].discrimination)
+        self.assertEqual(items[self.pks[0]].attempts, 6)
+        # Runs without new quizzes change nothing
+        self.assertEqual(self.analyse()[self.pks[0]].attempts, 6)
+
+    def test_endpoint(self):
+        self.analyse()
+        response = client.get(reverse('get_item_stats'),
+                              {'topic': 'Topic A', 'qids': 'someID0,someID1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['qid'] for item in response.data],
+                         ['someID0', 'someID1'])
+        self.assertEqual(response.data[0]['difficulty'], 0.75)
+        self.assertEqual(response.data[0]['choices'], [3, 1, 0])
+
+
+class RaschCalibrationTest(TestCase):
+    """
+    Test module to check the Rasch calibration of questions and users
+    """
+    def setUp(self):
+        topic = None
+        for name in ['tbartok', 'jdoe', 'asmith']:
+            user = Users.objects.create(
+                email=name + '@ualberta.ca', username=name,
+                password='blahblah', salt='salty')
+            if topic is None:
+                topic = Topics.objects.create(
+                    name="Topic A", creator_id=user, tags=["sample_tag"],
+                    learningoutcomes=["LO 1"])
+        for i in range(4):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username_id='tbartok',
+                learningoutcome=["LO 1"],
+                feedback=None,
+                hidden=False,
+                draft=False
+            )
+        self.pks = question_keys(['someID0', 'someID1', 'someID2', 'someID3'])
+        # Nobody answers the last question; the first is the easiest
+        quizzes = {'tbartok': [True, True, True],
+                   'jdoe': [True, True, False],
+                   'asmith': [True, False, False]}
+        for i in range(2):
+            for username, correctness in quizzes.items():
+                ReviewQuiz.objects.create(
+                    _id=username + str(i), questions=self.pks[:3],
+                    answers=[1 if c else 2 for c in correctness],
+                    correct=sum(correctness), total=3,
+                    username_id=username, topic_id='Topic A',
+                    correctness=correctness)
+
+    def test_calibration(self):
+        call_command('calibrate_irt', stdout=StringIO())
+        difficulty = dict(Questions.objects.values_list(
+            'pk', 'irt_difficulty'))
+        ability = dict(Users.objects.values_list('username', 'irt_ability'))
+        self.assertLess(difficulty[self.pks[0]], difficulty[self.pks[1]])
+        self.assertLess(difficulty[self.pks[1]], difficulty[self.pks[2]])
+        self.assertIsNone(difficulty[self.pks[3]])
+        self.assertGreater(ability['tbartok'], ability['jdoe'])
+        self.assertGreater(ability['jdoe'], ability['asmith'])
+
+    def test_small_chunks(self):
+        call_command('calibrate_irt', stdout=StringIO())
+        expected = dict(Users.objects.values_list('username', 'irt_ability'))
+        call_command('calibrate_irt', '--chunk-size', '2', stdout=StringIO())
+        for username, ability in Users.objects.values_list(
+                'username', 'irt_ability'):
+            self.assertAlmostEqual(ability, expected[username])
+
+
+class ResponseExportTest(TestCase):
+    """
+    Test module to check the export of the response matrix
+    """
+    def setUp(self):
+        import tempfile
+
+        for name in ['tbartok', 'jdoe']:
+            user = Users.objects.create(
+                email=name + '@ualberta.ca', username=name,
+                password='blahblah', salt='salty')
+        topic = Topics.objects.create(
+            name="Topic A", creator_id=user, tags=["sample_tag"],
+            learningoutcomes=["LO 1"])
+        for i in range(3):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic=topic,
+                username=user,
+                learningoutcome=["LO 1"],
+                feedback=None,
+                hidden=False,
+                draft=False
+            )
+        self.pks = question_keys(['someID0', 'someID1', 'someID2'])
+        self.take('quiz0', 'tbartok', [2, 0], [True, False])
+        self.take('quiz1', 'jdoe', [0, 1], [False, True])
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def take(self, _id, username, questions, correctness):
+        ReviewQuiz.objects.create(
+            _id=_id, questions=[self.pks[i] for i in questions],
+            answers=[1] * len(questions), correct=sum(correctness),
+            total=len(questions), username_id=username, topic_id='Topic A',
+            correctness=correctness)
+
+    def export(self, *args):
+        import numpy as np
+
+        call_command('export_responses', self.directory.name, *args,
+                     stdout=StringIO())
+        with open(self.directory.name + '/matrix.json') as source:
+            lookups = json.load(source)
+        users, questions, correct = [np.memmap(
+            self.directory.name + '/' + name, dtype=dtype, mode='r')
+            for name, dtype in [('users.int32', np.int32),
+                                ('questions.int32', np.int32),
+                                ('correct.uint8', np.uint8)]]
+        return {(lookups['users'][u], lookups['question_ids'][q]): c
+                for u, q, c in zip(users, questions, correct)}
+
+    def test_export(self):
+        self.assertEqual(self.export(), {
+            ('tbartok', 'someID2'): 1, ('tbartok', 'someID0'): 0,
+            ('jdoe', 'someID0'): 0, ('jdoe', 'someID1'): 1})
+
+    def test_append(self):
+        self.export()
+        self.take('quiz2', 'jdoe', [2], [True])
+        entries = self.export()
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(entries[('jdoe', 'someID2')], 1)
+        # Runs without new quizzes append nothing
+        self.assertEqual(len(self.export()), 5)
+        self.assertEqual(self.export('--rebuild'), entries)
+
+    def test_unsaved_answers(self):
+        from Quiz.responses import ResponseMatrix, response_chunks
+
+        self.export()
+        # Answers appended by a run that failed before saving
+        matrix = ResponseMatrix(self.directory.name)
+        for chunk in response_chunks(ReviewQuiz.objects.all()):
+            matrix.append(chunk)
+        self.assertEqual(len(self.export()), 4)
+
+
+class QuestionCountsTest(TestCase):
+    """
+    Test module to check that the question counts follow question writes
+    """
+    def setUp(self):
+        user = Users.objects.create(
+            email='tbartok@ualberta.ca', username='tbartok',
+            password='blahblah', salt='salty')
+        for name in ["Topic A", "Topic B"]:
+            Topics.objects.create(
+                name=name, creator_id=user, tags=["sample_tag"],
+                learningoutcomes=["LO 1", "LO 2"])
+        for i in range(3):
+            Questions.objects.create(
+                _id="someID" + str(i),
+                prompt="This is test question " + str(i),
+                shuffleoption=False,
+                choices=["A", "B"],
+                choiceanswers=[True, False],
+                typename="multipleChoice",
+                topic_id="Topic A",
+                username=user,
+                learningoutcome=["LO 1", "LO 2"] if i else ["LO 1"],
+                feedback=None,
+                hidden=False,
+                draft=False
+            )
+
+    def counts(self):
+        return {(row.topic_id, row.learningoutcome, row.draft, row.hidden):
+                row.count for row in QuestionCounts.objects.all()
+                if row.count}
+
+    def reconcile(self, *args):
+        output = StringIO()
+        call_command('reconcile_question_counts', *args, stdout=output)
+        return output.getvalue()
+
+    def test_create(self):
+        self.assertEqual(self.counts(), {
+            ('Topic A', '', False, False): 3,
+            ('Topic A', 'LO 1', False, False): 3,
+            ('Topic A', 'LO 2', False, False): 2})
+        self.assertIn('up to date', self.reconcile('--check'))
+
+    def test_update_and_delete(self):
+        question = Questions.objects.get(_id='someID1')
+        question.topic_id = 'Topic B'
+        question.learningoutcome = ['LO 2']
+        question.draft = True
+        question.save()
+        question = Questions.objects.get(_id='someID2')
+        question.hidden = True
+        question.save()
+        Questions.objects.get(_id='someID0').delete()
+        self.assertEqual(self.counts(), {
+            ('Topic A', '', False, True): 1,
+            ('Topic A', 'LO 1', False, True): 1,
+            ('Topic A', 'LO 2', False, True): 1,
+            ('Topic B', '', True, False): 1,
+            ('Topic B', 'LO 2', True, False): 1})
+        self.assertIn('up to date', self.reconcile('--check'))
+
+    def test_delete_stale_instance(self):
+        question = Questions.objects.get(_id='someID1')
+        stored = Questions.objects.get(_id='someID1')
+        stored.topic_id = 'Topic B'
+        stored.learningoutcome = ['LO 2']
+        stored.save()
+        question.delete()
+        self.assertEqual(self.counts(), {
+            ('Topic A', '', False, False): 2,
+            ('Topic A', 'LO 1', False, False): 2,
+            ('Topic A', 'LO 2', False, False): 1})
+        self.assertIn('up to date', self.reconcile('--check'))
+
+    def test_missing_total(self):
+        QuestionCounts.objects.filter(learningoutcome='').delete()
+        response = client.get(reverse('get_question_stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'Topic A': {'Total': 0, 'LO 1': 3, 'LO 2': 2}})
+
+    def test_reconcile(self):
+        from django.core.management.base import CommandError
+
+        Questions.objects.filter(_id='someID0').update(
+            learningoutcome=['LO 2'])
+        QuestionCounts.objects.filter(learningoutcome='').delete()
+        with self.assertRaises(CommandError):
+            self.reconcile('--check')
+        self.assertIn('Repaired 3', self.reconcile())
+        self.assertEqual(self.counts(), {
+            ('Topic A', '', False, False): 3,
+            ('Topic A', 'LO 1', False, False): 2,
+            ('Topic A', 'LO 2', False, False): 3})
+        self.assertIn('up to date', self.reconcile('--check'))
+
+    def test_topic_listing(self):
+        with self.assertNumQueries(2):
+            response = client.get(reverse('get_post_topics'))
+        counts = {topic['name']: topic['questioncount']
+                  for topic in response.data}
+        self.assertEqual(counts, {'Topic A': 3, 'Topic B': 0})
@@ -6,14 +6,24 @@ urlpatterns = [
     # Question URLS
     path('api/Quiz/SetQuestion', views.QuestionByIDViewSet.as_view(),
          name='question-detail'),
-    path('api/Quiz/QuestionByLOC', views.QuestionByLearningOutcome.as_view()),
+    path('api/Quiz/QuestionByLOC', views.QuestionByLearningOutcome.as_view(),
+         name='get_questions_by_loc'),
     path('api/Quiz/Questions', views.QuestionViewSet.as_view(),
          name='get_post_question'),
+    path('api/Quiz/QuestionImport', views.QuestionImportViewSet.as_view(),
+         name='import_questions'),
+    path('api/Quiz/QuestionExport', views.QuestionExportViewSet.as_view(),
+         name='export_questions'),
     path('api/Quiz/QuestionMod/<str:_id>/',
          views.QuestionModViewSet.as_view(), name='get_delete_update_questions'),
     path('api/Quiz/GenerateQuiz',
          views.QuestionIDByTopic.as_view(), name="get_questions"),
-    path('api/Quiz/QuestionRatings', views.QuestionRatingsViewSet.as_view()),
+    path('api/Quiz/GenerateQuizBatch', views.QuizBatchViewSet.as_view(),
+         name='generate_quiz_batch'),
+    path('api/Quiz/StagedQuiz/<str:_id>/', views.StagedQuizViewSet.as_view(),
+         name='get_staged_quiz'),
+    path('api/Quiz/QuestionRatings', views.QuestionRatingsViewSet.as_view(),
+         name='question_ratings'),
 
     # Topic URLS
     path('api/Quiz/Topics', views.TopicViewSet.as_view(), name='get_post_topics'),
@@ -22,12 +32,18 @@ urlpatterns = [
     path('api/Quiz/LearningOutcome', views.TopicLearningOutcomeViewSet.as_view()),
 
     # Quiz URLs
-    path('api/Quiz/Quiz', views.ReviewQuizViewSet.as_view()),
+    path('api/Quiz/Quiz', views.ReviewQuizViewSet.as_view(), name='get_post_quiz'),
+    path('api/Quiz/GradeQuiz', views.GradeQuizViewSet.as_view(),
+         name='grade_quiz'),
     path('api/Quiz/Comment', views.TopCommentViewSet.as_view()),
+    path('api/Quiz/Discussion', views.DiscussionViewSet.as_view(),
+         name='get_discussion'),
 
   
     #stats URLS
     path('api/Quiz/StatsByTopic', views.StatisticsByTopicViewSet.as_view(), name='get_quiz_stats'),
+    path('api/Quiz/ItemStats', views.ItemStatisticsViewSet.as_view(),
+         name='get_item_stats'),
     path('api/Quiz/NumberOfQuestions', views.QuestionsForTopicAndLOCViewSet.as_view(), name='get_question_stats'),
     path('api/Quiz/MyQuestionRatings', views.UserMadeQuestionRatingsViewSet.as_view(), name='get_ratings' ),
 
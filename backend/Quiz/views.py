@@ -4,14 +4,21 @@ All the views for our Quiz application.
 Currently we support the following views:
 
 1. **Questions** - Called to *get* and *add* questions.
-2. **QuestionMod** - Called to *get*, *update* and *delete* a specific question.
-3. **Topics** - Called to *get* and *add* topics.
-4. **TopicMod** - Called to *get*, *update* and *delete* a specific topic.
-5. **GenerateQuiz** - Called to *get* a set of questions.
-6. **Quiz** - Called to *get* and *add* quizzes.
-7. **Comment** - Called to *get* and *add* comments.
-8. **MyQuestionRatings** - Called to *get* ratings for a question.
-9. **StatsByTopic** - Called to *get* statistics per topic.
+2. **QuestionImport** - Called to *add* a batch of questions.
+3. **QuestionExport** - Called to *get* every question as a stream.
+4. **QuestionMod** - Called to *get*, *update* and *delete* a specific question.
+5. **Topics** - Called to *get* and *add* topics.
+6. **TopicMod** - Called to *get*, *update* and *delete* a specific topic.
+7. **GenerateQuiz** - Called to *get* a set of questions.
+8. **GenerateQuizBatch** - Called to *get* or *stage* many quizzes at once.
+9. **StagedQuiz** - Called to *get* a staged quiz.
+10. **Quiz** - Called to *get* and *add* quizzes.
+11. **GradeQuiz** - Called to *grade* and *add* a quiz.
+12. **Comment** - Called to *get* and *add* comments.
+13. **Discussion** - Called to *get* comments with their replies.
+14. **MyQuestionRatings** - Called to *get* ratings for a question.
+15. **StatsByTopic** - Called to *get* statistics per topic.
+16. **ItemStats** - Called to *get* the item analysis of questions.
 
 Views are built with [Generic Views](https://www.django-rest-framework.org/api-guide/generic-views/#genericapiview) from the Django REST framework.
 
@@ -19,15 +26,25 @@ Views are built with [Generic Views](https://www.django-rest-framework.org/api-g
 
 from .models import *
 from .serializers import *
+from .helperClasses import answerKeys, questionIds, topicQuestions
 
 # Python Libraries
 import json
 import random
 import hashlib
+import uuid
+import zlib
 
 from django.shortcuts import get_object_or_404
-from django.http import Http404
-from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (Count, ExpressionWrapper, F, FloatField, Func,
+                              OuterRef, Prefetch, Q, Subquery, Sum, TextField,
+                              Value)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, Ln
+from django.core.cache import cache
 
 from rest_framework import generics
 from rest_framework.views import APIView
@@ -36,6 +53,9 @@ from rest_framework import status
 from rest_framework.exceptions import ValidationError
 import django_filters.rest_framework
 from rest_framework import pagination
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.settings import api_settings
 
 # -----
 
@@ -83,12 +103,190 @@ class CustomPagination(pagination.PageNumberPagination):
             'results': data,
         })
 
+
+class QuestionCursorPagination(pagination.CursorPagination):
+    """
+    Keyset pagination for the Questions endpoint.
+
+    Pages are addressed by an opaque cursor over the question ``_id`` instead
+    of an offset, so a deep page costs the same as the first one and no
+    ``COUNT(*)`` query is issued. The page size is taken from **limit**.
+    """
+    ordering = '_id'
+    page_size = 100
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+
+class DiscussionPagination(pagination.CursorPagination):
+    """
+    Pages the top comments of a question by date, oldest first.
+    """
+    ordering = 'date'
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+# -----
+
+# === Custom Parsers ===
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline delimited JSON (one object per line) into a list.
+    Blank lines are skipped.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        items = []
+        for number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError('NDJSON parse error on line %d - %s'
+                                 % (number, exc))
+        return items
+
+# -----
+
+# === Sparse Fieldsets ===
+
+
+class SparseFieldsViewMixin():
+    """
+    Loads only the columns a SparseFieldsMixin serializer will output, so the
+    **fields** and **exclude** parameters narrow the SQL projection as well.
+    """
+
+    def project(self, queryset, *required):
+        serializer_class = self.get_serializer_class()
+        fields = serializer_class.requested_fields(self.request)
+        return queryset.only(*fields, *required)
+
+# -----
+
+# === Fast Read Path ===
+
+
+class ValuesListMixin():
+    """
+    Lists rows straight from ``.values()`` instead of building a model
+    instance and running every serializer field for each row. It is used
+    only when all serialized fields output their column unchanged, so the
+    response is the same as the serializer's; otherwise the regular list is
+    used.
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = values_plan(self.get_serializer())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = [column for name, column, field in plan]
+        # Cursor pagination reads its position from the ordering columns
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        for column in ordering:
+            if column.lstrip('-') not in columns:
+                columns.append(column.lstrip('-'))
+        rows = queryset.values(*columns)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(render_values(plan, page))
+        return Response(render_values(plan, rows))
+
+# -----
+
+# === Conditional Requests ===
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has been changed by another request.'
+    default_code = 'precondition_failed'
+
+
+class ETagMixin():
+    """
+    Adds strong ETags to a RetrieveUpdateDestroyAPIView.
+
+    The ETag is a hash of the serialized fields as stored in the row, so it
+    is computed without running the serializer. A GET whose If-None-Match
+    holds the current ETag gets a 304 with no body. A PUT, PATCH or DELETE
+    whose If-Match does not hold it gets a 412; the row is locked between
+    the check and the write.
+    """
+
+    def get_etag(self, instance):
+        fields = self.get_serializer_class().Meta.fields
+        values = [getattr(instance, field.attname)
+                  for field in instance._meta.concrete_fields
+                  if field.name in fields]
+        digest = hashlib.sha224(
+            json.dumps(values, default=str).encode("utf-8")).hexdigest()
+        return '"%s"' % digest
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.get_etag(instance)
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in etags or '*' in etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data, headers={'ETag': etag})
+
+    def check_if_match(self, request):
+        """
+        Returns the locked instance when the request has an If-Match header.
+        """
+        header = request.META.get('HTTP_IF_MATCH')
+        if header is None:
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        instance = get_object_or_404(
+            queryset.select_for_update(),
+            **{self.lookup_field: self.kwargs[self.lookup_field]})
+        etags = parse_etags(header)
+        if self.get_etag(instance) not in etags and '*' not in etags:
+            raise PreconditionFailed()
+        return instance
+
+    def update(self, request, *args, **kwargs):
+        """
+        Updates like UpdateModelMixin.update, reusing the instance locked by
+        check_if_match and taking the ETag from the saved instance.
+        """
+        partial = kwargs.pop('partial', False)
+        with transaction.atomic():
+            instance = self.check_if_match(request) or self.get_object()
+            serializer = self.get_serializer(
+                instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+        return Response(serializer.data,
+                        headers={'ETag': self.get_etag(serializer.instance)})
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            self.check_if_match(request)
+            return super().destroy(request, *args, **kwargs)
+
 # -----
 
 # === Question View ===
 
 
-class QuestionViewSet(generics.ListCreateAPIView):
+class QuestionViewSet(SparseFieldsViewMixin, ValuesListMixin,
+                      generics.ListCreateAPIView):
     """
     The QuestionViewSet class defines the Questions endpoint that allows
     the user to get questions from the system and add questions to the system.
@@ -96,6 +294,18 @@ class QuestionViewSet(generics.ListCreateAPIView):
     serializer_class = QuestionSerializer
     queryset = []
 
+    @property
+    def pagination_class(self):
+        """
+        Clients opt into keyset pagination with ``pagination=cursor`` (the
+        ``next`` and ``previous`` links keep it set). Everyone else keeps the
+        default limit/offset pagination.
+        """
+        params = self.request.query_params
+        if params.get('pagination') == 'cursor' or 'cursor' in params:
+            return QuestionCursorPagination
+        return api_settings.DEFAULT_PAGINATION_CLASS
+
     def get_queryset(self):
         """
         Depending on the given parameters, this function returns a set of
@@ -104,6 +314,11 @@ class QuestionViewSet(generics.ListCreateAPIView):
         The optional parameters are:
 
         - **username**: Username who created the question.
+        - **pagination**: Set to ``cursor`` to page with an opaque cursor.
+        - **cursor**: Cursor returned in the ``next``/``previous`` links.
+        - **limit**: Page size.
+        - **fields**: Comma separated fields to return.
+        - **exclude**: Comma separated fields to leave out.
         """
 
         username = self.request.query_params.get('username', None)
@@ -112,7 +327,7 @@ class QuestionViewSet(generics.ListCreateAPIView):
             queryset = Questions.objects.all()
 
         queryset = Questions.objects.exclude(hidden=True)
-        return queryset
+        return self.project(queryset)
 
     def perform_create(self, serializer):
         """
@@ -133,15 +348,158 @@ class QuestionViewSet(generics.ListCreateAPIView):
 
         serializer.save(_id=id)
 
+
+class QuestionImportViewSet(APIView):
+    """
+    The QuestionImportViewSet class defines the QuestionImport endpoint that
+    allows the user to add a batch of questions in one request.
+    """
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request, *args, **kwargs):
+        """
+        Add a batch of Questions
+
+        The body is a JSON list of questions, or NDJSON with one question per
+        line. IDs are computed from the prompts as for a single question, and
+        the whole batch is checked for existing questions, topics and users
+        with one query each before the new questions are inserted with
+        ``bulk_create``.
+
+        The response has one result per item, in order, whose **status** is
+        *created*, *duplicate* or *invalid*.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError('Expected a list of questions.')
+
+        ids = []
+        for item in items:
+            prompt = item.get('prompt') if isinstance(item, dict) else None
+            if isinstance(prompt, str):
+                ids.append(hashlib.sha224(prompt.encode("utf-8")).hexdigest())
+            else:
+                ids.append(None)
+
+        existing = set(Questions.objects.filter(
+            _id__in=[id for id in ids if id is not None]
+        ).values_list('_id', flat=True))
+
+        names = [item for item in items if isinstance(item, dict)]
+        topics = set(Topics.objects.filter(
+            name__in=[str(item.get('topic')) for item in names]
+        ).values_list('name', flat=True))
+        users = set(Users.objects.filter(
+            username__in=[str(item.get('username')) for item in names]
+        ).values_list('username', flat=True))
+
+        results = []
+        questions = []
+        for index, (item, id) in enumerate(zip(items, ids)):
+            result = {'index': index, '_id': id}
+            results.append(result)
+
+            serializer = QuestionImportSerializer(data=item)
+            if id is None or not serializer.is_valid():
+                result['status'] = 'invalid'
+                result['errors'] = serializer.errors if id is not None else {
+                    'prompt': ['A prompt is required.']}
+                continue
+
+            data = serializer.validated_data
+            errors = {}
+            if data['topic'] not in topics:
+                errors['topic'] = ['Topic "%s" does not exist.' % data['topic']]
+            if data['username'] not in users:
+                errors['username'] = [
+                    'User "%s" does not exist.' % data['username']]
+            if errors:
+                result['status'] = 'invalid'
+                result['errors'] = errors
+                continue
+
+            if id in existing:
+                result['status'] = 'duplicate'
+                continue
+
+            # Later copies of a prompt in the same batch are duplicates too
+            existing.add(id)
+            data['topic_id'] = data.pop('topic')
+            data['username_id'] = data.pop('username')
+            questions.append(Questions(_id=id, **data))
+            result['status'] = 'created'
+
+        with transaction.atomic():
+            Questions.objects.bulk_create(questions, batch_size=500)
+            QuestionCounts.record(QuestionCounts.changes(questions))
+        for topic in set(question.topic_id for question in questions):
+            topicQuestions.invalidate(topic)
+
+        return Response({'created': len(questions), 'results': results})
+
+
+class QuestionExportViewSet(APIView):
+    """
+    The QuestionExportViewSet class defines the QuestionExport endpoint that
+    streams the question bank, one question per line.
+    """
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        """
+        Streams every question as NDJSON, each line being a question as
+        returned by the Questions endpoint. The rows are read through a
+        server-side cursor in chunks, so memory use does not grow with the
+        size of the bank.
+
+        The optional parameters are:
+
+        - **topic**: Topic name.
+        - **gzip**: Set to ``true`` to gzip the stream.
+        """
+        topic = self.request.query_params.get('topic', None)
+        compress = self.request.query_params.get('gzip', '') == 'true'
+
+        queryset = Questions.objects.order_by('_id')
+        if topic is not None:
+            queryset = queryset.filter(topic=topic)
+
+        lines = self.lines(queryset)
+        if compress:
+            response = StreamingHttpResponse(
+                self.gzip(lines), content_type='application/gzip')
+            response['Content-Disposition'] = \
+                'attachment; filename="questions.ndjson.gz"'
+        else:
+            response = StreamingHttpResponse(
+                lines, content_type='application/x-ndjson')
+            response['Content-Disposition'] = \
+                'attachment; filename="questions.ndjson"'
+        return response
+
+    def lines(self, queryset):
+        for question in queryset.iterator(chunk_size=self.chunk_size):
+            data = QuestionSerializer(question).data
+            yield (json.dumps(data) + '\n').encode('utf-8')
+
+    def gzip(self, chunks):
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
 # -----
 
 # === QuestionMod View ===
 
 
-class QuestionModViewSet(generics.RetrieveUpdateDestroyAPIView):
+class QuestionModViewSet(ETagMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     The QuestionModViewSet class defines the QuestionMod endpoint that allows
     the user to get, update and delete a specific question in the system.
+    Responses carry an ETag for conditional requests.
     """
     serializer_class = QuestionSerializer
     lookup_field = '_id'
@@ -196,17 +554,16 @@ class QuestionRatingsViewSet(generics.ListCreateAPIView):
         - **qid**: Question ID.
         """
         qid = self.request.query_params.get('qid', None)
-        queryset = QuestionRatings.objects.filter(qid=qid).values()
-        rating = 0
-        ratingCount = 0
-        for item in queryset:
-            rating += item['rating']
 
-        total = len(queryset)
-        if total == 0:
+        # The totals are kept on the question row by QuestionRatings.save
+        totals = Questions.objects.filter(_id=qid).values(
+            'rating_sum', 'rating_count').first()
+        ratingCount = totals['rating_count'] if totals is not None else 0
+
+        if ratingCount == 0:
             ratingDec = None
         else:
-            ratingDec = rating/ratingCount
+            ratingDec = totals['rating_sum']/ratingCount
 
         obj = {'qid': qid, 'rating': ratingDec,
                'Number of ratings': ratingCount}
@@ -228,81 +585,467 @@ class QuestionRatingsViewSet(generics.ListCreateAPIView):
 
 
 
-class QuestionByIDViewSet(generics.ListCreateAPIView):
+class QuestionByIDViewSet(SparseFieldsViewMixin, generics.ListCreateAPIView):
     serializer_class = QuestionSerializer
 
     def get_queryset(self):
         id = self.request.query_params.get('qID', None)
         queryset = Questions.objects.filter(_id=id)
-        return queryset
+        return self.project(queryset)
 
     def post(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
 
-class QuestionIDByTopic(generics.ListCreateAPIView):
+class QuestionIDByTopic(SparseFieldsViewMixin, generics.ListCreateAPIView):
+    """
+    The QuestionIDByTopic class defines the GenerateQuiz endpoint that returns
+    a random set of multiple choice questions for a topic.
+    """
     serializer_class = QuestionSerializer
+    seed = None
+    cache_timeout = 300
+    # Fields reordered when the choices of a question are shuffled
+    shuffled_fields = ('shuffleoption', 'choices', 'choiceanswers', 'feedback')
 
     def get_queryset(self):
+        """
+        The optional parameters are:
+
+        - **topic**: Topic name.
+        - **numQuestions**: Number of questions to return.
+        - **adaptive**: Set to ``true`` to favour what **username** gets wrong.
+        - **excludeSeen**: Leave out the questions **username** saw in their
+          last N quizzes.
+        - **username**: Username taking the quiz.
+        - **seed**: Seed of the quiz, see list.
+        - **fields**: Comma separated fields to return.
+        - **exclude**: Comma separated fields to leave out.
+
+        The sample is drawn from the cached keys of the topic's questions
+        (see topicQuestions) and only the chosen rows are read, so the cost
+        does not grow with the number of questions in the topic. Adaptive
+        quizzes weigh every question of the topic, so they are drawn by the
+        database instead.
+        """
         topic = self.request.query_params.get('topic', None)
         number = self.request.query_params.get('numQuestions', None)
+        adaptive = self.request.query_params.get('adaptive', None) == 'true'
+        username = self.request.query_params.get('username', None)
 
-        queryset = Questions.objects.filter(
-            topic=topic, typename="multipleChoice")
+        if number is not None and not (adaptive and username is not None):
+            queryset = self.sample(topic, int(number))
+        else:
+            queryset = self.project(self.exclude_seen(self.questions(topic)),
+                                    *self.required_fields())
+            if number is not None:
+                queryset = list(queryset.annotate(
+                    weight=self.weakness(topic, username)).order_by(
+                    (Ln(1.0 - self.random()) / F('weight')).desc()
+                )[:int(number)])
 
-        if number is not None:
-            queryset = random.sample(list(queryset), int(number))
+        if self.seed is not None:
+            queryset = self.shuffle_choices(list(queryset))
 
         return queryset
 
+    def sample(self, topic, number):
+        """
+        Picks **number** question keys from the pool of the topic, leaving
+        out the questions seen (see exclude_seen), and reads only those
+        questions. With a seed the same seed always picks the same questions
+        from the same pool.
+
+        The pool may be out of date in this process, so the rows are read
+        with the topic and type filter: questions deleted or moved since are
+        left out and replaced by more keys from the pool.
+        """
+        pool = topicQuestions.get_many([topic]).get(topic, [])
+        seen = self.seen()
+        seen = set() if seen is None else set(seen)
+        rng = random.Random(self.seed) if self.seed is not None else random
+        queryset = self.project(self.questions(topic), *self.required_fields())
+
+        questions = []
+        while len(questions) < number and pool:
+            wanted = number - len(questions)
+            # Enough keys to be left with wanted once the seen ones are dropped
+            picked = rng.sample(pool, min(wanted + len(seen), len(pool)))
+            chosen = [pk for pk in picked if pk not in seen]
+            rows = queryset.in_bulk(chosen)
+            questions.extend([rows[pk] for pk in chosen if pk in rows][:wanted])
+            picked = set(picked)
+            pool = [pk for pk in pool if pk not in picked]
+        return questions
+
+    @staticmethod
+    def questions(topic):
+        return Questions.objects.filter(topic=topic, typename="multipleChoice")
+
+    def random(self):
+        """
+        Returns a random number in [0, 1) for each question. With a seed the
+        number is taken from md5(seed || _id), so the same seed always picks
+        the same questions.
+        """
+        if self.seed is None:
+            return Func(function='RANDOM', output_field=FloatField())
+        return RawSQL(
+            "('x' || substr(md5(%s || \"questions\".\"_id\"), 1, 8))"
+            "::bit(32)::bigint / 4294967296.0", (self.seed,),
+            output_field=FloatField())
+
+    def required_fields(self):
+        return self.shuffled_fields if self.seed is not None else ()
+
+    def shuffle_choices(self, questions):
+        """
+        Shuffles the choices of the questions that allow it, in an order
+        given by the seed and the question, along with their answers and
+        feedback.
+        """
+        for question in questions:
+            if not question.shuffleoption:
+                continue
+            order = self.choice_order(self.seed, question._id,
+                                      len(question.choices))
+            for field in ['choices', 'choiceanswers', 'feedback']:
+                values = getattr(question, field)
+                if values is not None and len(values) == len(order):
+                    setattr(question, field, [values[i] for i in order])
+        return questions
+
+    @staticmethod
+    def choice_order(seed, qid, size):
+        """
+        Returns the original indexes of the choices of a question, in the
+        order a seeded quiz shows them.
+        """
+        order = list(range(size))
+        random.Random('%s:%s' % (seed, qid)).shuffle(order)
+        return order
+
+    def weakness(self, topic, username):
+        """
+        Returns how weak the user is on each question, as the share of wrong
+        answers given to the question plus the largest share for one of its
+        learning outcomes. Shares start at 0.5 with no answers (one right
+        and one wrong answer are assumed) so unseen questions still come up.
+
+        The questions are then ordered by ``-ln(random()) / weight``, which
+        draws them with probability proportional to their weight (the
+        Efraimidis-Spirakis weighted sample). Only the
+        QuestionMastery and OutcomeMastery rows of the user are read.
+        """
+        # Outcomes without an OutcomeMastery row count with 0.5 as well
+        outcome_share = Coalesce(RawSQL(
+            'SELECT max(coalesce((m.attempts - m.correct + 1)::float '
+            '/ (m.attempts + 2), 0.5)) '
+            'FROM unnest({questions}.learningoutcome) AS o(outcome) '
+            'LEFT JOIN {mastery} m ON m.learningoutcome = o.outcome '
+            'AND m.username_id = %s AND m.topic_id = %s'.format(
+                questions=connection.ops.quote_name(
+                    Questions._meta.db_table),
+                mastery=connection.ops.quote_name(
+                    OutcomeMastery._meta.db_table)),
+            (username, topic), output_field=FloatField()), Value(0.5))
+
+        mastery = QuestionMastery.objects.filter(
+            username=username, qid=OuterRef('pk')).annotate(
+            share=Cast(F('attempts') - F('correct') + 1, FloatField())
+            / Cast(F('attempts') + 2, FloatField())).values('share')
+        question_share = Coalesce(Subquery(mastery, output_field=FloatField()),
+                                  Value(0.5))
+        return ExpressionWrapper(question_share + outcome_share,
+                                 output_field=FloatField())
+
+    def seen(self):
+        """
+        Returns a queryset of the keys of the questions seen in the last
+        **excludeSeen** quizzes of **username**, using the last_quiz kept on
+        QuestionMastery, or None when no questions are left out.
+        """
+        number = self.request.query_params.get('excludeSeen', None)
+        username = self.request.query_params.get('username', None)
+        if number is None or username is None:
+            return None
+        if not number.isdigit():
+            raise ValidationError('excludeSeen must be a number of quizzes.')
+
+        taken = Users.objects.filter(username=username).values('quizzes_taken')
+        return QuestionMastery.objects.filter(
+            username=username,
+            last_quiz__gt=Subquery(taken) - int(number)).values_list(
+            'qid', flat=True)
+
+    def exclude_seen(self, queryset):
+        """
+        Leaves out the questions seen (see seen). This adds a subquery, not
+        a query, whatever the user's history.
+        """
+        seen = self.seen()
+        if seen is None:
+            return queryset
+        return queryset.exclude(pk__in=seen)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Questions can also be drawn per learning outcome, with either:
+
+        - **quotas**: Comma separated ``outcome:number`` pairs.
+        - **balanced**: Set to ``true`` to split **numQuestions** evenly
+          across the learning outcomes of the topic.
+
+        The response then holds the questions under **results** and, under
+        **unmet**, how many questions each quota is short of.
+
+        A quiz is reproducible with **seed**: the same parameters and seed
+        give the same questions, and the choices of questions with
+        shuffleoption set are shuffled in the same order. Pass ``seed=new``
+        to have the server pick one. The seed is returned in the
+        ``Quiz-Seed`` header. Seeded quizzes that do not depend on a user
+        are cached for ``cache_timeout`` seconds.
+        """
+        params = self.request.query_params
+        seed = params.get('seed', None)
+        if seed is not None:
+            self.seed = uuid.uuid4().hex if seed in ('', 'new') else seed
+
+        key = None
+        if seed not in (None, '', 'new') and 'username' not in params:
+            key = 'GenerateQuiz:' + hashlib.sha224(
+                json.dumps(sorted(params.lists())).encode("utf-8")).hexdigest()
+            data = cache.get(key)
+            if data is not None:
+                return Response(data, headers={'Quiz-Seed': self.seed})
+
+        quotas = self.get_quotas()
+        if quotas is None:
+            response = super().list(request, *args, **kwargs)
+        else:
+            topic = self.request.query_params.get('topic', None)
+            questions, unmet = self.sample_by_outcome(topic, quotas)
+            serializer = self.get_serializer(questions, many=True)
+            response = Response({'results': serializer.data, 'unmet': unmet})
+
+        if self.seed is not None:
+            response['Quiz-Seed'] = self.seed
+        if key is not None:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
+
+    def get_quotas(self):
+        params = self.request.query_params
+        if 'quotas' in params:
+            quotas = {}
+            for item in params['quotas'].split(','):
+                outcome, sep, number = item.rpartition(':')
+                if not sep or not number.isdigit():
+                    raise ValidationError(
+                        'quotas must be given as outcome:number pairs.')
+                quotas[outcome] = int(number)
+            return quotas
+
+        if params.get('balanced') == 'true':
+            number = params.get('numQuestions', '')
+            if not number.isdigit():
+                raise ValidationError(
+                    'numQuestions is required to balance a quiz.')
+            topic = get_object_or_404(Topics, name=params.get('topic', None))
+            outcomes = topic.learningoutcomes
+            if not outcomes:
+                return {}
+            share, extra = divmod(int(number), len(outcomes))
+            return {outcome: share + (i < extra)
+                    for i, outcome in enumerate(outcomes)}
+
+        return None
+
+    def sample_by_outcome(self, topic, quotas):
+        """
+        Draws a random sample for every outcome in one UNION ALL query over
+        the learning outcome index, then fills the quotas without repeating
+        a question and loads the chosen questions with a second query.
+        """
+        total = sum(quotas.values())
+        base = self.exclude_seen(Questions.objects.filter(
+            topic=topic, typename="multipleChoice"))
+        samples = [
+            base.filter(learningoutcome__contains=[outcome]).annotate(
+                stratum=Value(outcome, output_field=TextField())
+            ).order_by(self.random()).values_list('pk', 'stratum')[:total]
+            for outcome, quota in quotas.items() if quota > 0]
+
+        candidates = {outcome: [] for outcome in quotas}
+        if samples:
+            for qid, outcome in samples[0].union(*samples[1:], all=True):
+                candidates[outcome].append(qid)
+
+        # Outcomes with the fewest questions pick first
+        chosen = []
+        chosen_set = set()
+        unmet = {}
+        for outcome in sorted(quotas, key=lambda o: len(candidates[o])):
+            picked = 0
+            for qid in candidates[outcome]:
+                if picked == quotas[outcome]:
+                    break
+                if qid not in chosen_set:
+                    chosen.append(qid)
+                    chosen_set.add(qid)
+                    picked += 1
+            if picked < quotas[outcome]:
+                unmet[outcome] = quotas[outcome] - picked
+
+        questions = self.project(Questions.objects.filter(pk__in=chosen),
+                                 *self.required_fields()).in_bulk()
+        questions = [questions[qid] for qid in chosen]
+        if self.seed is not None:
+            questions = self.shuffle_choices(questions)
+        return questions, unmet
+
+
+class QuizBatchViewSet(SparseFieldsViewMixin, generics.GenericAPIView):
+    """
+    The QuizBatchViewSet class defines the GenerateQuizBatch endpoint that
+    generates many quizzes for a topic in one request.
+    """
+    serializer_class = QuestionSerializer
+    max_count = 1000
+
+    def post(self, request, *args, **kwargs):
+        """
+        The parameters are:
+
+        - **topic**: Topic name.
+        - **numQuestions**: Number of questions per quiz.
+        - **count**: Number of quizzes to generate.
+        - **roster**: List of usernames (optional).
+
+        The question IDs of the topic are read once and every quiz is sampled
+        from them in memory. Without a roster the quizzes are returned with
+        their questions. With a roster one quiz is staged per student and
+        only the staged quiz IDs are returned; students then get their quiz
+        from the StagedQuiz endpoint.
+        """
+        topic = request.data.get('topic', None)
+        number = request.data.get('numQuestions', None)
+        roster = request.data.get('roster', None)
+        if roster is not None and not (
+                isinstance(roster, list)
+                and all(isinstance(username, str) for username in roster)):
+            raise ValidationError('roster must be a list of usernames.')
+        count = len(roster) if roster is not None else \
+            request.data.get('count', None)
+        try:
+            number = int(number)
+            count = int(count)
+        except (TypeError, ValueError):
+            raise ValidationError('numQuestions and count are required.')
+        if number < 0:
+            raise ValidationError('numQuestions cannot be negative.')
+        if not 1 <= count <= self.max_count:
+            raise ValidationError(
+                'Between 1 and %d quizzes can be generated at once.'
+                % self.max_count)
+
+        pool = list(Questions.objects.filter(
+            topic=topic, typename="multipleChoice").values_list('pk', flat=True))
+        number = min(number, len(pool))
+        quizzes = [random.sample(pool, number) for i in range(count)]
+
+        if roster is not None:
+            return self.stage(topic, roster, quizzes)
+
+        chosen = set(qid for quiz in quizzes for qid in quiz)
+        questions = self.project(Questions.objects.filter(pk__in=chosen))
+        data = {qid: self.get_serializer(question).data
+                for qid, question in questions.in_bulk().items()}
+        return Response({'quizzes': [[data[qid] for qid in quiz]
+                                     for quiz in quizzes]})
+
+    def stage(self, topic, roster, quizzes):
+        if not Topics.objects.filter(name=topic).exists():
+            raise ValidationError('Topic "%s" does not exist.' % topic)
+        users = set(Users.objects.filter(
+            username__in=roster).values_list('username', flat=True))
+        missing = [username for username in roster if username not in users]
+        if missing:
+            raise ValidationError('Unknown users: %s' % ', '.join(missing))
+
+        staged = [StagedQuiz(_id=uuid.uuid4().hex, topic_id=topic,
+                             username_id=username, questions=quiz)
+                  for username, quiz in zip(roster, quizzes)]
+        StagedQuiz.objects.bulk_create(staged)
+        return Response({'quizzes': [
+            {'_id': quiz._id, 'username': quiz.username_id}
+            for quiz in staged]}, status=status.HTTP_201_CREATED)
+
+
+class StagedQuizViewSet(SparseFieldsViewMixin, generics.GenericAPIView):
+    """
+    The StagedQuizViewSet class defines the StagedQuiz endpoint that returns
+    a quiz staged by GenerateQuizBatch.
+    """
+    serializer_class = QuestionSerializer
+
+    def get(self, request, *args, **kwargs):
+        staged = get_object_or_404(StagedQuiz, _id=self.kwargs['_id'])
+        questions = self.project(Questions.objects.filter(
+            pk__in=staged.questions)).in_bulk()
+        serializer = self.get_serializer(
+            [questions[qid] for qid in staged.questions if qid in questions],
+            many=True)
+        return Response({'_id': staged._id, 'topic': staged.topic_id,
+                         'username': staged.username_id,
+                         'questions': serializer.data})
+
 
 class QuestionByLearningOutcome(generics.ListCreateAPIView):
+    """
+    The QuestionByLearningOutcome class defines the QuestionByLOC endpoint
+    that returns the questions covering every requested learning outcome.
+    """
     serializer_class = QuestionLearningOutComeSerializer
 
     def get_queryset(self):
+        """
+        The parameters are:
+
+        - **learningoutcome**: Comma separated list of learning outcomes.
+        - **topic**: Topic name (optional).
+
+        The intersection is resolved in a single query: the
+        questionlearningoutcome index on (learningoutcome, qid) is grouped by
+        question and only questions matching every outcome are kept.
+        """
         topic = self.request.query_params.get('topic', None)
         learningoutcome = self.request.query_params.get(
             'learningoutcome', None)
+        if learningoutcome is None:
+            return QuestionLearningOutCome.objects.none()
         learningoutcome = learningoutcome.split(",")
 
-        # Gets the list of queries that need to be checked for learning outcome
-        queries = []
-        querysetquery = []
-        for item in learningoutcome:
-            queryset = QuestionLearningOutCome.objects.filter(
-                topic=topic, learningoutcome=item)
-            queryval = queryset.values()
-            queries.append(queryval)
-            querysetquery.append(queryset)
-        accepted = {}
-
-        # counts to see if the question matches the number of times a learning outcome is shown
-        for item in queries:
-            for q in item:
-                if q['qid'] not in accepted:
-                    accepted[q['qid']] = 1
-                else:
-                    accepted[q['qid']] += 1
-        send = []
-
-        # This is some nasty ass code maybe I'll fix it later
-        # Anyway what it does its check to see if a question has a learningoutcome for each request one
-        # then it finds the index of the actual query item and adds it to a list
-        for item in accepted:
-            if accepted[item] == len(queries):
-                for i in range(len(queries)):
-                    for j in range(len(queries[i])):
-                        if item == queries[i][j]['qid']:
-                            send.append(querysetquery[i][j])
-
-        return send
+        # Questions that have a row for each of the requested outcomes
+        matching = QuestionLearningOutCome.objects.filter(
+            learningoutcome__in=learningoutcome).values('qid').annotate(
+            outcomes=Count('learningoutcome', distinct=True)).filter(
+            outcomes=len(set(learningoutcome))).values('qid')
+
+        queryset = QuestionLearningOutCome.objects.filter(
+            qid__in=matching, learningoutcome__in=learningoutcome
+        ).select_related('qid')
+        if topic is not None:
+            queryset = queryset.filter(qid__topic=topic)
+
+        return queryset
 
 # -----
 
 # === Quiz Views ===
 
 
-class ReviewQuizViewSet(generics.ListCreateAPIView):
+class ReviewQuizViewSet(ValuesListMixin, generics.ListCreateAPIView):
     """
     The ReviewQuizViewSet class defines the Quiz endpoint that allows
     the user to get and add quizzes in the system.
@@ -339,12 +1082,104 @@ class ReviewQuizViewSet(generics.ListCreateAPIView):
         """
         serializer.save()
 
+
+class GradeQuizViewSet(APIView):
+    """
+    The GradeQuizViewSet class defines the GradeQuiz endpoint that grades a
+    submitted quiz on the server and stores it.
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        The parameters are:
+
+        - **username**: Username who took the quiz.
+        - **topic**: Topic of the quiz.
+        - **questions**: List of question IDs.
+        - **answers**: List with, for every question, the list of selected
+          choice indexes.
+        - **seed**: Seed of the quiz from GenerateQuiz (optional). The
+          indexes of questions whose choices the seed shuffled are taken in
+          the shuffled order.
+        - **_id**: Quiz ID (optional).
+
+        A question is correct when exactly its correct choices are
+        selected. Answers are stored with the unshuffled choice indexes.
+        Answer keys and learning outcomes come from an in-memory cache, so
+        grading reads the database at most once, for the questions not
+        cached yet; storing the quiz and its totals only writes.
+        """
+        questions = request.data.get('questions', None)
+        answers = request.data.get('answers', None)
+        if not isinstance(questions, list) or not isinstance(answers, list) \
+                or len(questions) != len(answers):
+            raise ValidationError(
+                'questions and answers must be lists of the same length.')
+        if not all(isinstance(qid, str) for qid in questions):
+            raise ValidationError('questions must be a list of question IDs.')
+        seed = request.data.get('seed', None)
+        if seed is not None and not isinstance(seed, (str, int)):
+            raise ValidationError('seed must be a string.')
+
+        keys = answerKeys.get_many(questions)
+        missing = [qid for qid in questions if qid not in keys]
+        if missing:
+            raise ValidationError('Unknown questions: %s' % ', '.join(missing))
+
+        pks = []
+        selections = []
+        correctness = []
+        learningoutcomes = {}
+        for qid, selected in zip(questions, answers):
+            if isinstance(selected, int) and not isinstance(selected, bool):
+                selected = [selected]
+            mask, choices, pk, shuffled, outcomes = keys[qid]
+            if not isinstance(selected, list) or not all(
+                    isinstance(i, int) and not isinstance(i, bool)
+                    and 0 <= i < choices for i in selected):
+                raise ValidationError(
+                    'Answers must be lists of choice indexes.')
+            if seed is not None and shuffled:
+                order = QuestionIDByTopic.choice_order(seed, qid, choices)
+                selected = [order[i] for i in selected]
+            try:
+                selections.append(ReviewQuiz.encode_answer(selected))
+            except ValueError as error:
+                raise ValidationError(str(error))
+            correctness.append(selections[-1] == mask)
+            pks.append(pk)
+            learningoutcomes[pk] = outcomes
+
+        quiz = ReviewQuiz(
+            _id=request.data.get('_id', None) or uuid.uuid4().hex,
+            questions=pks,
+            answers=selections,
+            correct=sum(correctness),
+            total=len(questions),
+            username_id=request.data.get('username', None),
+            topic_id=request.data.get('topic', None),
+            correctness=correctness)
+        try:
+            with transaction.atomic():
+                quiz.save(force_insert=True,
+                          learningoutcomes=learningoutcomes)
+                # Foreign keys are deferred; check them before committing
+                connection.check_constraints()
+        except IntegrityError:
+            raise ValidationError(
+                'The quiz already exists or its user or topic does not.')
+
+        # The response shows the question IDs the keys were read for
+        questionIds.set_many(dict(zip(pks, questions)))
+        return Response(ReviewQuizSerializer(quiz).data,
+                        status=status.HTTP_201_CREATED)
+
 # -----
 
 # === Topic Views ===
 
 
-class TopicViewSet(generics.ListCreateAPIView):
+class TopicViewSet(ValuesListMixin, generics.ListCreateAPIView):
     """
     The TopicViewSet class defines the Topics endpoint that allows
     the user to get and add topics in the system.
@@ -360,6 +1195,9 @@ class TopicViewSet(generics.ListCreateAPIView):
         The optional parameters are:
 
         - **name**: Topic name.
+
+        Each topic comes with its number of questions, read from
+        QuestionCounts.
         """
         topic = self.request.query_params.get('name', None)
 
@@ -368,7 +1206,11 @@ class TopicViewSet(generics.ListCreateAPIView):
         else:
             queryset = Topics.objects.all().filter(hidden=False)
 
-        return queryset
+        counts = QuestionCounts.objects.filter(
+            topic=OuterRef('pk'), learningoutcome='').order_by().values(
+            'topic').annotate(questions=Sum('count')).values('questions')
+        return queryset.annotate(
+            questioncount=Coalesce(Subquery(counts), 0))
 
     def perform_create(self, serializer):
         """
@@ -393,10 +1235,11 @@ class TopicLearningOutcomeViewSet(generics.ListCreateAPIView):
         return self.list(request, *args, **kwargs)
 
 
-class TopicModViewSet(generics.RetrieveUpdateDestroyAPIView):
+class TopicModViewSet(ETagMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     The TopicModViewSet class defines the TopicMod endpoint that allows
     the user to get, update and delete a specific topic in the system.
+    Responses carry an ETag for conditional requests.
     """
     serializer_class = TopicsSerializer
     lookup_field = 'name'
@@ -437,7 +1280,7 @@ class TopicModViewSet(generics.RetrieveUpdateDestroyAPIView):
 # === Comment Views ===
 
 
-class TopCommentViewSet(generics.ListCreateAPIView):
+class TopCommentViewSet(SparseFieldsViewMixin, generics.ListCreateAPIView):
     """
     The TopCommentViewSet class defines the Comment endpoint that allows
     the user to get and add comments for a question in the system.
@@ -453,10 +1296,12 @@ class TopCommentViewSet(generics.ListCreateAPIView):
         The optional parameters are:
 
         - **questionID**: Question ID.
+        - **fields**: Comma separated fields to return.
+        - **exclude**: Comma separated fields to leave out.
         """
         questionId = self.request.query_params.get('questionID', None)
-        queryset = TopComment.objects.filter(parentid_id=questionId)
-        return queryset
+        queryset = TopComment.objects.filter(parentid___id=questionId)
+        return self.project(queryset)
 
     def perform_create(self, serializer):
         """
@@ -508,6 +1353,35 @@ class ChildCommentUpdateViewSet(generics.UpdateAPIView):
         serializer.save()
 
 
+class DiscussionViewSet(generics.ListAPIView):
+    """
+    The DiscussionViewSet class defines the Discussion endpoint that returns
+    the top comments of a question, each with its replies, paginated by date.
+    """
+    serializer_class = DiscussionSerializer
+    pagination_class = DiscussionPagination
+
+    def get_queryset(self):
+        """
+        If required parameters are met, this function returns a page of top
+        comments with their replies nested.
+
+        The required parameters are:
+
+        - **questionID**: Question ID.
+
+        A page is read with two queries, one for the top comments and one
+        for all of their replies, however many threads it holds.
+        """
+        questionId = self.request.query_params.get('questionID', None)
+        replies = ChildComment.objects.order_by('date')
+        queryset = TopComment.objects.filter(
+            parentid___id=questionId).annotate(
+            question=F('parentid___id')).prefetch_related(
+            Prefetch('replies', queryset=replies))
+        return queryset
+
+
 """
 ----------------------------------------------------------------------------
 Statistics Views
@@ -534,36 +1408,52 @@ class StatisticsByTopicViewSet(generics.ListCreateAPIView):
         topicId = self.request.query_params.get('topic', None)
         userId = self.request.query_params.get('username', None)
 
+        # Totals are kept per user and topic in TopicStatistics, so this
+        # reads one row per (user, topic) pair instead of every quiz.
+        queryset = TopicStatistics.objects.all()
+        if topicId != None:
+            queryset = queryset.filter(topic=topicId)
+        if userId != None:
+            queryset = queryset.filter(username=userId)
 
-        # Case 1: User and Topic provided
-        if userId != None and topicId != None:
-            queryset = ReviewQuiz.objects.filter(
-                topic=topicId, username=userId)
-        # Case 2: Only Topic provided
-        elif topicId != None:
-            queryset = ReviewQuiz.objects.filter(topic=topicId)
-        # Case 3: Only User provided
-        elif userId != None:
-            queryset = ReviewQuiz.objects.filter(username=userId)
-        # Case 4: Nothing provided
-
-        else:
-            queryset = ReviewQuiz.objects.all()
+        totals = queryset.values('topic').annotate(
+            topic_total=Sum('total'), topic_correct=Sum('correct'))
 
         retdict = {}
-        for item in queryset.values():
-            # Add to dict
-            if item['topic_id'] not in retdict:
-                retdict[item['topic_id']] = {'topic': 0, 'correct': 0}
-            # Increase count by total and correct for that quiz
-            retdict[item['topic_id']]['topic'] += item['total']
-            retdict[item['topic_id']]['correct'] += item['correct']
+        for item in totals:
+            retdict[item['topic']] = {'topic': item['topic_total'],
+                                      'correct': item['topic_correct']}
 
         response = Response(retdict)
 
         return response
 
 
+class ItemStatisticsViewSet(ValuesListMixin, generics.ListAPIView):
+    """
+    The ItemStatisticsViewSet defines the endpoint that returns the item
+    analysis of questions: how many answers they got, their difficulty
+    (share of correct answers), their discrimination (point-biserial
+    correlation with the rest of the quiz) and how often each choice was
+    selected. The statistics are computed by the ``item_analysis`` command.
+    The GET can take two arguments:
+    - **topic**: the topic of the questions (optional)
+    - **qids**: comma separated question ids (optional)
+    """
+    serializer_class = ItemStatisticsSerializer
+
+    def get_queryset(self):
+        topic = self.request.query_params.get('topic', None)
+        qids = self.request.query_params.get('qids', None)
+
+        queryset = ItemStatistics.objects.order_by('qid')
+        if topic is not None:
+            queryset = queryset.filter(qid__topic=topic)
+        if qids is not None:
+            queryset = queryset.filter(qid___id__in=qids.split(','))
+        return queryset
+
+
 class QuestionsForTopicAndLOCViewSet(generics.ListCreateAPIView):
     """
     The QuestionsForTopicAndLOCViewSet defines the endpoint that allows for
@@ -574,6 +1464,8 @@ class QuestionsForTopicAndLOCViewSet(generics.ListCreateAPIView):
     If only a topic is provided, it will return stats on that topic, if a learningoutcome is 
     also specified, it will return informatin on the topic and only that learning outcome
     if neither is specified, it will return info on all topics.
+    Learning outcomes stored as empty strings are not listed separately;
+    their questions are part of the total.
     """
     serializer_class = QuestionSerializer
 
@@ -582,48 +1474,27 @@ class QuestionsForTopicAndLOCViewSet(generics.ListCreateAPIView):
         learningOutcome = self.request.query_params.get(
             'learningOutcome', None)
 
+        # Counts are kept per draft and hidden state; the empty learning
+        # outcome row of a topic counts all its questions
+        counts = QuestionCounts.objects.all()
         if topic != None:
-            querysetTopic = Questions.objects.filter(topic=topic).values()
-        else:
-            querysetTopic = Questions.objects.all().values()
+            counts = counts.filter(topic_id=topic)
+        counts = counts.values_list('topic_id', 'learningoutcome').annotate(
+            questions=Sum('count')).filter(questions__gt=0).order_by(
+            'topic_id', 'learningoutcome')
 
+        total = 'total' if topic != None else 'Total'
         retdict = {}
-        # If a topic was given, get size, else find total topics
         if topic != None:
-            retdict[topic] = {'total': len(querysetTopic)}
-            # Gets LOC if provided
-            if learningOutcome != None:
-                for item in querysetTopic:
-                    if learningOutcome in item['learningoutcome']:
-                        if learningOutcome not in retdict[item['topic_id']]:
-                            retdict[item['topic_id']][learningOutcome] = 1
-                        else:
-                            retdict[item['topic_id']][learningOutcome] += 1
-
-            else:
-                for item in querysetTopic:
-                    for val in item['learningoutcome']:
-                        if val not in retdict[item['topic_id']]:
-                            retdict[item['topic_id']][val] = 1
-                        else:
-                            retdict[item['topic_id']][val] += 1
-
-        else:
-            for item in querysetTopic:
-
-                # Get number of questions
-
-                if item['topic_id'] not in retdict:
-                    retdict[item['topic_id']] = {'Total': 1}
-                else:
-                    retdict[item['topic_id']]['Total'] += 1
-
-                # Gets LOC if provided
-                for val in item['learningoutcome']:
-                    if val not in retdict[item['topic_id']]:
-                        retdict[item['topic_id']][val] = 1
-                    else:
-                        retdict[item['topic_id']][val] += 1
+            retdict[topic] = {total: 0}
+        for topic_id, outcome, count in counts:
+            # A drifted total row may be missing while its outcomes are not
+            topic_counts = retdict.setdefault(topic_id, {total: 0})
+            if outcome == '':
+                topic_counts[total] = count
+            elif topic == None or learningOutcome == None \
+                    or outcome == learningOutcome:
+                topic_counts[outcome] = count
 
         response = Response(retdict)
         return response
@@ -639,41 +1510,45 @@ class UserMadeQuestionRatingsViewSet(generics.ListCreateAPIView):
     question, you can provide the question id.
 
     Note that at least one of them MUST be provided
+
+    For dashboards there is also a batch mode, taking comma separated lists:
+    - **usernames**: the usernames whose questions you want statistics on (optional)
+    - **qids**: the question ids you want information on (optional)
+    it returns, for every rated question, its author, average rating and number of ratings.
+
+    Either way the ratings are read in one query from the totals kept on the questions.
     """
     serializer_class = QuestionRatingsSerializer
 
     def get(self, request, *args, **kwargs):
-        username = self.request.query_params.get('username', None)
-        qid = self.request.query_params.get('qid', None)
+        params = self.request.query_params
+        batch = 'usernames' in params or 'qids' in params
+        if batch:
+            usernames = params.get('usernames', '')
+            qids = params.get('qids', '')
+        else:
+            usernames = params.get('username', '')
+            qids = params.get('qid', '')
+        usernames = [name for name in usernames.split(',') if name]
+        qids = [qid for qid in qids.split(',') if qid]
 
-        queryset = None
-        # qid for specific
-        # user for generic all my qs
-        if qid != None:
-            queryset = QuestionRatings.objects.filter(qid=qid).values()
-        if username != None:
-            questions = Questions.objects.filter(username=username).values()
-            queryset = []
-            for item in questions:
-                items = QuestionRatings.objects.filter(
-                    qid=item['_id']).values()
-                for val in items:
-                    queryset.append(val)
-
-        if queryset == None:
+        if not usernames and not qids:
             return Response("Error: you need to provide a qid or username")
 
+        queryset = Questions.objects.filter(
+            Q(_id__in=qids) | Q(username__in=usernames),
+            rating_count__gt=0).values(
+            '_id', 'username', 'rating_sum', 'rating_count')
+
         obj = {}
-        count = {}
         for item in queryset:
-            if item['qid_id'] not in obj:
-                obj[item['qid_id']] = item['rating']
-                count[item['qid_id']] = 1
+            average = item['rating_sum']/item['rating_count']
+            if batch:
+                obj[item['_id']] = {'username': item['username'],
+                                    'rating': average,
+                                    'Number of ratings': item['rating_count']}
             else:
-                obj[item['qid_id']] += item['rating']
-                count[item['qid_id']] += 1
-        for item in obj:
-            obj[item] = obj[item]/count[item]
+                obj[item['_id']] = average
         response = Response(obj)
         return response
 